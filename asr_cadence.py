@@ -0,0 +1,100 @@
+from typing import Callable
+
+import numpy as np
+
+from asr_engine import ASREngine
+from asr_result import ASRResult
+
+
+class AdaptiveCadence:
+    """
+    按实测 RTF 与排队深度动态调整 ASR 的触发间隔。
+    音频通过 engine.append() / append_pcm16() 写入，只有新音频累计到当前间隔时才调用
+    engine.process_pending()。
+    流式 RTF = 单次识别耗时 / 触发间隔，即每秒新音频消耗的计算时间；
+    间隔取 单次耗时的指数滑动平均 × (1 + 排队深度) / target_load，
+    使流式 RTF 维持在 target_load 附近，并限制在 [min_interval_sec, max_interval_sec]。
+    引擎在窗口不足 min_process_sec 时不会识别，因此 min_interval_sec 至少取引擎的 min_process_sec。
+    """
+
+    def __init__(
+        self,
+        engine: ASREngine,
+        *,
+        min_interval_sec: float = 0.5,
+        max_interval_sec: float = 3.0,
+        initial_interval_sec: float = 1.0,
+        target_load: float = 0.5,
+        smoothing: float = 0.3,
+        queue_depth: Callable[[], int] | None = None,
+    ) -> None:
+        if not 0 < min_interval_sec <= max_interval_sec:
+            raise ValueError("require 0 < min_interval_sec <= max_interval_sec")
+        if not 0 < target_load <= 1:
+            raise ValueError("target_load must be in (0, 1]")
+        engine_min_sec = engine.one_second_samples / engine.sample_rate
+        if max_interval_sec < engine_min_sec:
+            raise ValueError(
+                f"max_interval_sec must be >= the engine's min_process_sec ({engine_min_sec}s)"
+            )
+        self.engine = engine
+        self.min_interval_sec = max(min_interval_sec, engine_min_sec)
+        self.max_interval_sec = max_interval_sec
+        self.initial_interval_sec = initial_interval_sec
+        self.target_load = target_load
+        self.smoothing = smoothing
+        self.queue_depth = queue_depth
+        self.reset()
+
+    def reset(self) -> None:
+        self.engine.reset()
+        self.interval_sec = min(
+            max(self.initial_interval_sec, self.min_interval_sec), self.max_interval_sec
+        )
+        self.asr_duration_ema: float | None = None
+
+    def push_chunk(self, chunk: np.ndarray, flush: bool = False) -> ASRResult | None:
+        """
+        写入 chunk；未到触发间隔（且 flush=False）时返回 None，否则返回本次识别结果。
+        """
+        self.engine.append(chunk)
+        return self._maybe_flush(flush)
+
+    def push_pcm16(
+        self, pcm: bytes | bytearray | memoryview, flush: bool = False
+    ) -> ASRResult | None:
+        """
+        与 push_chunk() 相同，接收 16-bit little-endian PCM。
+        """
+        self.engine.append_pcm16(pcm)
+        return self._maybe_flush(flush)
+
+    def _maybe_flush(self, flush: bool) -> ASRResult | None:
+        interval_samples = self.interval_sec * self.engine.sample_rate
+        if not flush and self.engine.unprocessed_samples < interval_samples:
+            return None
+        return self.flush()
+
+    def flush(self) -> ASRResult:
+        result = self.engine.process_pending()
+        self._update(result)
+        result.set_metric("cadence_sec", self.interval_sec)
+        result.set_metric(
+            "stream_rtf",
+            self.asr_duration_ema / self.interval_sec if self.asr_duration_ema is not None else 0.0,
+        )
+        return result
+
+    def _update(self, result: ASRResult) -> None:
+        if result.asr_duration_sec <= 0 or result.audio_duration_sec <= 0:
+            # 未真正运行 ASR（缓冲 / 静音 / 出错），保持当前节奏
+            return
+        asr_duration_sec = result.asr_duration_sec
+        if self.asr_duration_ema is None:
+            self.asr_duration_ema = asr_duration_sec
+        else:
+            self.asr_duration_ema += self.smoothing * (asr_duration_sec - self.asr_duration_ema)
+
+        depth = self.queue_depth() if self.queue_depth is not None else 0
+        interval_sec = self.asr_duration_ema * (1 + depth) / self.target_load
+        self.interval_sec = min(max(interval_sec, self.min_interval_sec), self.max_interval_sec)
@@ -0,0 +1,117 @@
+import json
+from typing import NamedTuple
+
+from asr_result import STATUS_COMMITTED, STATUS_PARTIAL, ASRResult
+
+
+class Emission(NamedTuple):
+    result: ASRResult
+    is_final: bool
+    # 客户端应把当前显示文本截断到 offset，再追加 text
+    offset: int
+    text: str
+    delta: bool
+
+    def to_protocol_json(
+        self, session_id: str, seq_no: int, timestamp_ms: tuple[int, int] | None = None
+    ) -> str:
+        if not self.delta:
+            return self.result.to_protocol_json(session_id, seq_no, self.is_final, timestamp_ms)
+        if timestamp_ms is None:
+            timestamp_ms = (
+                round(self.result.window_start_sec * 1000),
+                round(self.result.window_end_sec * 1000),
+            )
+        # 增量模式面向高频小消息：省略连接内不变的 session_id 与恒为 null 的 confidence，使用紧凑分隔符
+        return json.dumps(
+            {
+                "type": "result",
+                "seq_no": seq_no,
+                "data": {
+                    "text": self.text,
+                    "offset": self.offset,
+                    "is_final": self.is_final,
+                    "timestamp_ms": {"start": timestamp_ms[0], "end": timestamp_ms[1]},
+                },
+            },
+            ensure_ascii=False,
+            separators=(",", ":"),
+        )
+
+
+class ResultEmitter:
+    """
+    决定 ASREngine 的结果中哪些需要下发给客户端。
+    partial 只在可见文本变化时发送，且两次发送至少间隔 min_partial_interval_sec，
+    间隔内到达的 partial 只保留最新一个，到期后由 poll() 取出；final 总是立即发送并清空待发 partial。
+    delta=True 时每条消息只携带相对上一条的变化后缀与其起始位置 offset，否则携带整句文本。
+    """
+
+    def __init__(self, *, min_partial_interval_sec: float = 0.5, delta: bool = False) -> None:
+        self.min_partial_interval_sec = min_partial_interval_sec
+        self.delta = delta
+        self.reset()
+
+    def reset(self) -> None:
+        # 客户端当前显示的未提交文本
+        self.visible = ""
+        # 产生 visible 的那次结果，finish() 时用来补发 final
+        self.last_result: ASRResult | None = None
+        self.pending: ASRResult | None = None
+        self.last_partial_time: float | None = None
+
+    def next_due(self, now: float) -> float | None:
+        """
+        待发 partial 还需等待的秒数；没有待发 partial 时返回 None。
+        """
+        if self.pending is None:
+            return None
+        if self.last_partial_time is None:
+            return 0.0
+        return max(0.0, self.last_partial_time + self.min_partial_interval_sec - now)
+
+    def push(self, result: ASRResult, now: float) -> Emission | None:
+        if result.status == STATUS_COMMITTED:
+            self.pending = None
+            return self._emit(result, result.merged, is_final=True)
+        if result.status != STATUS_PARTIAL:
+            return None
+        if result.merged == self.visible:
+            # 文本未变化（包括间隔内先变化又变回的情况），不必发送
+            self.pending = None
+            return None
+        self.pending = result
+        return self.poll(now)
+
+    def poll(self, now: float) -> Emission | None:
+        due = self.next_due(now)
+        if due is None or due > 0:
+            return None
+        result, self.pending = self.pending, None
+        self.last_partial_time = now
+        return self._emit(result, result.merged, is_final=False)
+
+    def finish(self) -> Emission | None:
+        """
+        流结束时把尚未提交的文本（含待发 partial）作为 final 发送。
+        """
+        result, self.pending = self.pending, None
+        if result is not None and result.merged:
+            return self._emit(result, result.merged, is_final=True)
+        if self.visible and self.last_result is not None:
+            return self._emit(self.last_result, self.visible, is_final=True)
+        return None
+
+    def _emit(self, result: ASRResult, text: str, is_final: bool) -> Emission:
+        if self.delta:
+            offset = 0
+            limit = min(len(self.visible), len(text))
+            while offset < limit and self.visible[offset] == text[offset]:
+                offset += 1
+            emission = Emission(result, is_final, offset, text[offset:], True)
+        else:
+            emission = Emission(result, is_final, 0, text, False)
+        # final 之后开始新的一句
+        self.visible = "" if is_final else text
+        self.last_result = None if is_final else result
+        return emission
@@ -1,99 +1,457 @@
+import dataclasses
 import time
 from typing import Any
 
+import faster_whisper
 import numpy as np
 from faster_whisper import WhisperModel
+from faster_whisper.tokenizer import Tokenizer
+from faster_whisper.transcribe import TranscriptionOptions, get_suppressed_tokens
+from loguru import logger
 
-from utils.string import get_changed_part
+from asr_result import (
+    REASON_BUFFER_OVERFLOW,
+    REASON_EMPTY_AFTER_FILTER,
+    REASON_EMPTY_CHUNK,
+    REASON_ENDPOINT_SILENCE,
+    REASON_ENERGY_GATE,
+    REASON_ERROR,
+    REASON_FINAL_PASS,
+    REASON_FINALIZE,
+    REASON_HALLUCINATION_REMOVED,
+    REASON_INSUFFICIENT_WINDOW,
+    REASON_LOCAL_AGREEMENT,
+    REASON_LONG_SEGMENT,
+    REASON_SEGMENT_GAP,
+    REASON_STABLE,
+    REASON_VAD_NO_SPEECH,
+    STATUS_BUFFERING,
+    STATUS_COMMITTED,
+    STATUS_ERROR,
+    STATUS_NO_SPEECH,
+    STATUS_PARTIAL,
+    STATUS_TAIL,
+    ASRResult,
+    counted_reason,
+)
+from utils.audio import frame_energy, is_silent
+from utils.latency import (
+    STAGE_APPEND,
+    STAGE_ASR,
+    STAGE_DIFF,
+    STAGE_ENDPOINT,
+    STAGE_FEATURES,
+    STAGE_FILTER,
+    STAGE_PARTIAL_ASR,
+    STAGE_SEGMENTS,
+    STAGE_VAD,
+    STAGE_WINDOW,
+    StageProfiler,
+)
+from utils.mel_cache import LogMelCache
+from utils.ring_buffer import AudioRingBuffer
+from utils.string import AhoCorasick, get_changed_part
+from vad_engine import VADBackend, WhisperVAD
 
 
+# feature_cache 直接调用 faster-whisper 的内部接口（generate_segments、TranscriptionOptions 的字段），
+# 按 1.2.x 编写；其他版本或接口不匹配时回退到 transcribe()
+FEATURE_CACHE_VERSIONS = ("1.2.",)
+
 class ASREngine:
     def __init__(
         self,
         asr_model: WhisperModel | None = None,
         vad_model: WhisperModel | None = None,
         *,
+        vad_backend: VADBackend | None = None,
         asr_model_path: str | None = None,
         vad_model_path: str | None = None,
         device: str = "cuda",
         sample_rate: int = 16000,
         min_process_sec: float = 1.0,
+        frame_duration_ms: int = 20,
         max_sentence_sec: float = 20.0,
+        max_buffer_sec: float = 30.0,
+        audio_cache: AudioRingBuffer | None = None,
+        feature_cache: bool = False,
+        two_tier: bool = False,
         vad_no_speech_threshold: float = 0.8,
+        energy_gate_rms: float | None = None,
+        energy_gate_peak: float | None = None,
+        energy_frame_ms: float = 20.0,
+        endpoint_silence_sec: float | None = None,
+        endpoint_rms_threshold: float = 0.01,
         stable_repeat_threshold: int = 3,
+        commit_policy: str = "stable",
         min_cut_sec: float = 1.0,
         prompt_tail_chars: int = 20,
         hallucination_blacklist: list[str] | None = None,
+        profile_stages: bool = False,
     ) -> None:
         if asr_model is None:
             if not asr_model_path:
                 raise ValueError("asr_model or asr_model_path is required")
             asr_model = WhisperModel(asr_model_path, device=device)
-        if vad_model is None:
+        if vad_model is None and (vad_backend is None or two_tier):
             if not vad_model_path:
-                raise ValueError("vad_model or vad_model_path is required")
+                if two_tier:
+                    raise ValueError("two_tier requires vad_model or vad_model_path")
+                raise ValueError("vad_backend, vad_model or vad_model_path is required")
             vad_model = WhisperModel(vad_model_path, device=device)
+        if vad_backend is None:
+            vad_backend = WhisperVAD(vad_model, no_speech_threshold=vad_no_speech_threshold)
 
         self.asr_model = asr_model
         self.vad_model = vad_model
+        self.vad_backend = vad_backend
+        # 两级解码：partial 由小模型（vad_model）产出，只有即将提交时才调用 asr_model
+        self.two_tier = two_tier
         self.sample_rate = sample_rate
         self.one_second_samples = int(sample_rate * min_process_sec)
+        # push_pcm16 的帧长契约（协议 6.2），握手协商后可由调用方修改
+        self.frame_duration_ms = frame_duration_ms
         self.max_sentence_sec = max_sentence_sec
+        if audio_cache is None:
+            audio_cache = AudioRingBuffer(int(sample_rate * max_buffer_sec))
+        self.audio_cache = audio_cache
+        # 增量 log-mel 缓存（默认关闭，依赖 faster-whisper 内部接口，见 _init_feature_cache）；
+        # 关闭时每次把整段窗口交给 transcribe
+        self.mel_cache: LogMelCache | None = None
+        if feature_cache:
+            self._init_feature_cache()
         self.vad_no_speech_threshold = vad_no_speech_threshold
+        self.energy_gate_rms = energy_gate_rms
+        self.energy_gate_peak = energy_gate_peak
+        self.energy_frame_samples = max(1, int(sample_rate * energy_frame_ms / 1000))
+        self.endpoint_silence_sec = endpoint_silence_sec
+        self.endpoint_rms_threshold = endpoint_rms_threshold
         self.stable_repeat_threshold = stable_repeat_threshold
+        if commit_policy not in ("stable", "local_agreement"):
+            raise ValueError(f"unknown commit_policy: {commit_policy}")
+        self.commit_policy = commit_policy
         self.min_cut_sec = min_cut_sec
         self.prompt_tail_chars = prompt_tail_chars
         self.hallucination_blacklist = hallucination_blacklist or []
+        self.hallucination_filter = AhoCorasick(self.hallucination_blacklist)
+        # 各阶段耗时直方图，profile_stages=False 时不读时钟；profiler.snapshot() 查看本引擎，
+        # utils.latency.process_snapshot() 查看进程内所有引擎的汇总
+        self.profiler = StageProfiler(profile_stages)
 
         self.reset()
 
+    @property
+    def start_idx(self) -> int:
+        return self.audio_cache.start_idx
+
+    @start_idx.setter
+    def start_idx(self, value: int) -> None:
+        self.audio_cache.release(value)
+
+    @property
+    def end_idx(self) -> int:
+        return self.audio_cache.end_idx
+
     def reset(self) -> None:
-        self.audio_cache = np.empty((0,), dtype=np.float32)
-        self.start_idx = 0
-        self.end_idx = 0
+        self.audio_cache.reset()
+        self.vad_backend.reset()
+        if self.mel_cache is not None:
+            self.mel_cache.reset(self.start_idx)
+        self.last_copied_bytes = 0
+        # push_pcm16 写入但尚未识别的采样点数，以及写入时产生的原因（如 buffer_overflow）
+        self.unprocessed_samples = 0
+        self.ingest_reasons: list[str] = []
+        # 端点检测：已按帧分析到的位置，以及最后一个语音帧的结束位置
+        self.endpoint_tracked_idx = self.start_idx
+        self.last_speech_end_idx = self.start_idx
 
         self.last_valid_text = ""
         self.last_merged_text = ""
         self.same_merged_count = 0
         self.initial_prompt = ""
         self.is_speech = False
+        self.pending_asr: dict[str, Any] | None = None
+        # (识别时的 start_idx, [(word_start_idx, word_end_idx, word)])，local_agreement 用来与下一次结果比对
+        self.previous_hypothesis: tuple[int, list[tuple[int, int, str]]] | None = None
+
+    def push_chunk(self, chunk: np.ndarray) -> ASRResult:
+        start_ns = self.profiler.now()
+        try:
+            result = self._push_chunk(chunk)
+        except Exception as exc:
+            result = self.build_error_result(exc)
+        if self.profiler.tracer is not None:
+            self.trace_result("push_chunk", start_ns, result)
+        return result
+
+    def push_pcm16(
+        self, pcm: bytes | bytearray | memoryview, *, flush: bool = False
+    ) -> ASRResult | None:
+        # 新音频累计满 min_process_sec（或 flush=True）时运行一次识别并返回结果，否则返回 None
+        self.append_pcm16(pcm)
+        if not flush and self.unprocessed_samples < self.one_second_samples:
+            return None
+        return self.process_pending()
+
+    def append(self, chunk: np.ndarray) -> None:
+        """
+        只写入音频、不识别；写入时产生的原因（如 buffer_overflow）留到 process_pending() 返回。
+        """
+        start_ns = self.profiler.now()
+        chunk = np.asarray(chunk, dtype=np.float32).reshape(-1)
+        self._ingested(self.audio_cache.write(chunk), len(chunk))
+        self.profiler.lap(STAGE_APPEND, start_ns)
+
+    def append_pcm16(self, pcm: bytes | bytearray | memoryview) -> None:
+        """
+        与 append() 相同，接收 16-bit little-endian PCM，按 1/32768 缩放后直接写入环形缓冲区，
+        不产生中间数组；pcm 必须由整数个协商帧组成。
+        """
+        frame_bytes = self.sample_rate * 2 * self.frame_duration_ms // 1000
+        if len(pcm) % frame_bytes != 0:
+            raise ValueError(
+                f"PCM payload is {len(pcm)} bytes, expected a multiple of {frame_bytes} "
+                f"({self.frame_duration_ms}ms frames)"
+            )
+        start_ns = self.profiler.now()
+        samples = np.frombuffer(pcm, dtype="<i2")
+        self._ingested(self.audio_cache.write_pcm16(samples), len(samples))
+        self.profiler.lap(STAGE_APPEND, start_ns)
+
+    def _ingested(self, dropped: int, samples: int) -> None:
+        if dropped > 0 and REASON_BUFFER_OVERFLOW not in self.ingest_reasons:
+            self.ingest_reasons.append(REASON_BUFFER_OVERFLOW)
+        self.unprocessed_samples += samples
+
+    def process_pending(self) -> ASRResult:
+        """
+        对 append() / append_pcm16() 写入的音频运行一次识别。
+        """
+        reasons, self.ingest_reasons = self.ingest_reasons, []
+        self.unprocessed_samples = 0
+        return self.process(reasons)
 
-    def push_chunk(self, chunk: np.ndarray) -> dict[str, Any]:
+    def build_error_result(self, exc: Exception) -> ASRResult:
+        self.pending_asr = None
+        return ASRResult(
+            STATUS_ERROR,
+            error=str(exc),
+            window_start_sec=self.start_idx / self.sample_rate,
+            window_end_sec=self.end_idx / self.sample_rate,
+            last_valid=self.last_valid_text,
+            prompt=self.initial_prompt,
+            cache_samples=len(self.audio_cache),
+            capacity_samples=self.audio_cache.capacity,
+            reasons=[REASON_ERROR],
+        )
+
+    def process(self, reasons: list[str] | None = None) -> ASRResult:
+        start_ns = self.profiler.now()
         try:
-            return self._push_chunk(chunk)
+            result = self.prepare_window(reasons)
+            if result is None:
+                result = self._run_asr()
         except Exception as exc:
-            return {
-                "status": "error",
-                "error": str(exc),
-                "time": {
-                    "window_start_sec": self.start_idx / self.sample_rate,
-                    "window_end_sec": self.end_idx / self.sample_rate,
-                    "cut_from_sec": None,
-                    "cut_to_sec": None,
-                },
-                "text": {
-                    "merged": "",
-                    "delta": "",
-                    "last_valid": self.last_valid_text,
-                    "prompt": self.initial_prompt,
-                },
-                "vad": {"ran": False, "no_speech_probs": []},
-                "metrics": {
-                    "asr_duration_sec": 0.0,
-                    "audio_duration_sec": 0.0,
-                    "rtf": 0.0,
-                },
-                "debug": {"reasons": ["error"]},
-            }
-
-    def _push_chunk(self, chunk: np.ndarray) -> dict[str, Any]:
+            result = self.build_error_result(exc)
+        if self.profiler.tracer is not None:
+            self.trace_result("process", start_ns, result)
+        return result
+
+    def trace_result(self, name: str, start_ns: int, result: ASRResult) -> None:
+        self.profiler.trace_span(
+            name,
+            start_ns,
+            {
+                "session": self.profiler.track,
+                "status": result.status,
+                "window_start_sec": result.window_start_sec,
+                "window_end_sec": result.window_end_sec,
+                "reasons": result.reasons,
+            },
+        )
+
+    def _push_chunk(self, chunk: np.ndarray) -> ASRResult:
+        result = self.prepare_chunk(chunk)
+        if result is not None:
+            return result
+        return self._run_asr()
+
+    def _run_asr(self) -> ASRResult:
+        start_time = time.perf_counter()
+        min_cut_idx = None
+        if self.two_tier:
+            pending = self.pending_asr
+            reasons = list(pending["reasons"])
+            text_state = (
+                self.last_valid_text,
+                self.last_merged_text,
+                self.same_merged_count,
+                self.previous_hypothesis,
+            )
+            start_ns = self.profiler.now()
+            partial_segments, info = self.vad_model.transcribe(
+                pending["window"],
+                language="ja",
+                word_timestamps=True,
+                condition_on_previous_text=False,
+                initial_prompt=self.initial_prompt,
+            )
+            partial_segments = list(partial_segments)
+            self.profiler.lap(STAGE_PARTIAL_ASR, start_ns)
+            result = self.complete_asr(
+                partial_segments, info.duration, start_time, partial_only=True
+            )
+            if result is not None:
+                result.set_metric("model", "partial_model")
+                return result
+            # 小模型判定需要提交：恢复文本状态，用大模型在同一切点重新识别
+            (
+                self.last_valid_text,
+                self.last_merged_text,
+                self.same_merged_count,
+                self.previous_hypothesis,
+            ) = text_state
+            pending["reasons"] = reasons + [REASON_FINAL_PASS]
+            self.pending_asr = pending
+            min_cut_idx = pending["commit_idx"]
+
+        asr_segments, audio_duration_sec = self._transcribe_window()
+        result = self.complete_asr(
+            asr_segments, audio_duration_sec, start_time, min_cut_idx=min_cut_idx
+        )
+        result.set_metric("model", "asr_model")
+        return result
+
+    def _init_feature_cache(self) -> None:
+        """
+        启用增量 log-mel 缓存。缓存的特征与 faster-whisper 的 FeatureExtractor 有一处差异：
+        FeatureExtractor 对每段音频单独做 STFT，两端按 reflect 方式补齐半帧；
+        缓存中窗口首列使用环形缓冲区里窗口之前的真实音频（流开头或重置后为 0），
+        末尾不足一帧的列补零。内部列与 FeatureExtractor 一致（误差约 1e-7），
+        两端各一列左右的差异可达 0.09，因此默认关闭，需显式传入 feature_cache=True，
+        并先用 tests/test_feature_cache.py 确认与 transcribe() 的输出一致。
+        """
+        version = getattr(faster_whisper, "__version__", "")
+        if not version.startswith(FEATURE_CACHE_VERSIONS):
+            logger.warning(
+                f"feature_cache disabled: requires faster-whisper {FEATURE_CACHE_VERSIONS}, "
+                f"found {version or 'unknown'}"
+            )
+            return
+        try:
+            feature_extractor = self.asr_model.feature_extractor
+            mel_cache = LogMelCache(
+                feature_extractor.mel_filters,
+                self.audio_cache.capacity,
+                n_fft=feature_extractor.n_fft,
+                hop_length=feature_extractor.hop_length,
+            )
+            self.tokenizer = Tokenizer(
+                self.asr_model.hf_tokenizer,
+                self.asr_model.model.is_multilingual,
+                task="transcribe",
+                language="ja",
+            )
+            self.transcription_options = self._build_transcription_options()
+        except (AttributeError, TypeError) as exc:
+            logger.warning(f"feature_cache disabled: faster-whisper internals changed: {exc}")
+            return
+        self.mel_cache = mel_cache
+
+    def _transcribe_window(self) -> tuple[list[Any], float]:
+        start_ns = self.profiler.now()
+        if self.mel_cache is None:
+            return self._transcribe_audio(start_ns)
+
+        window_start_idx = self.pending_asr["window_start_idx"]
+        window_end_idx = self.pending_asr["window_end_idx"]
+        features = self.window_features(window_start_idx, window_end_idx)
+        start_ns = self.profiler.lap(STAGE_FEATURES, start_ns)
+        # 特征从 start_idx 所在的 hop 边界开始，模型给出的时间戳以该边界为零点
+        hop_length = self.mel_cache.hop_length
+        self.pending_asr["time_origin_idx"] = window_start_idx - window_start_idx % hop_length
+        try:
+            asr_segments = self.asr_model.generate_segments(
+                features,
+                self.tokenizer,
+                dataclasses.replace(self.transcription_options, initial_prompt=self.initial_prompt),
+                False,
+            )
+            # generate_segments 是惰性生成器，解码发生在 list() 中
+            asr_segments = list(asr_segments)
+        except (AttributeError, TypeError) as exc:
+            # 内部接口与 FEATURE_CACHE_VERSIONS 不符，此后改走 transcribe()
+            logger.warning(f"feature_cache disabled: generate_segments failed: {exc}")
+            self.mel_cache = None
+            del self.pending_asr["time_origin_idx"]
+            return self._transcribe_audio(start_ns)
+        self.profiler.lap(STAGE_ASR, start_ns)
+        return asr_segments, (window_end_idx - window_start_idx) / self.sample_rate
+
+    def _transcribe_audio(self, start_ns: int) -> tuple[list[Any], float]:
+        asr_segments, info = self.asr_model.transcribe(
+            self.pending_asr["window"],
+            language="ja",
+            word_timestamps=True,
+            condition_on_previous_text=False,
+            initial_prompt=self.initial_prompt,
+        )
+        asr_segments = list(asr_segments)
+        self.profiler.lap(STAGE_ASR, start_ns)
+        return asr_segments, info.duration
+
+    def window_features(self, start_idx: int, end_idx: int) -> np.ndarray:
+        cache = self.mel_cache
+        if cache.end_idx < start_idx or cache.end_idx > end_idx:
+            # 中间的音频已被释放（no_speech / 溢出）或引擎被重置，从窗口起点重新累积
+            cache.reset(start_idx)
+        if cache.end_idx < end_idx:
+            # 用 read() 复制新增音频：window() 跨环尾时会改写 scratch，
+            # 而 pending_asr["window"] 可能正是 scratch 的视图（回退到 transcribe 时仍要使用）
+            cache.feed(self.audio_cache.read(cache.end_idx, end_idx))
+        return cache.features(start_idx, end_idx)
+
+    def _build_transcription_options(self) -> TranscriptionOptions:
+        # 与 faster-whisper 1.2.1 中 transcribe(language="ja", word_timestamps=True,
+        # condition_on_previous_text=False) 的默认值一致
+        return TranscriptionOptions(
+            beam_size=5,
+            best_of=5,
+            patience=1,
+            length_penalty=1,
+            repetition_penalty=1,
+            no_repeat_ngram_size=0,
+            log_prob_threshold=-1.0,
+            no_speech_threshold=0.6,
+            compression_ratio_threshold=2.4,
+            condition_on_previous_text=False,
+            prompt_reset_on_temperature=0.5,
+            temperatures=[0.0, 0.2, 0.4, 0.6, 0.8, 1.0],
+            initial_prompt=None,
+            prefix=None,
+            suppress_blank=True,
+            suppress_tokens=get_suppressed_tokens(self.tokenizer, [-1]),
+            without_timestamps=False,
+            max_initial_timestamp=1.0,
+            word_timestamps=True,
+            prepend_punctuations="\"'“¿([{-",
+            append_punctuations="\"'.。,，!！?？:：”)]}、",
+            multilingual=False,
+            max_new_tokens=None,
+            clip_timestamps="0",
+            hallucination_silence_threshold=None,
+            hotwords=None,
+        )
+
+    def prepare_chunk(self, chunk: np.ndarray) -> ASRResult | None:
+        self.pending_asr = None
         if chunk is None or len(chunk) == 0:
             return self._build_result(
-                status="buffering",
+                status=STATUS_BUFFERING,
                 merged_text="",
                 delta_text="",
                 no_speech_probs=[],
-                reasons=["empty_chunk"],
+                reasons=[REASON_EMPTY_CHUNK],
                 asr_duration_sec=0.0,
                 audio_duration_sec=0.0,
                 cut_from_sec=None,
@@ -103,20 +461,26 @@ class ASREngine:
                 vad_ran=False,
             )
 
-        chunk = np.asarray(chunk, dtype=np.float32).reshape(-1)
-        self.audio_cache = np.concatenate([self.audio_cache, chunk], axis=0)
-        self.end_idx += len(chunk)
+        self.append(chunk)
+        reasons, self.ingest_reasons = self.ingest_reasons, []
+        self.unprocessed_samples = 0
+        return self.prepare_window(reasons)
+
+    def prepare_window(self, reasons: list[str] | None = None) -> ASRResult | None:
+        self.pending_asr = None
+        self.last_copied_bytes = 0
+        reasons = [] if reasons is None else reasons
         window_start_idx = self.start_idx
         window_end_idx = self.end_idx
 
         active_samples = self.end_idx - self.start_idx
         if active_samples < self.one_second_samples:
             return self._build_result(
-                status="buffering",
+                status=STATUS_BUFFERING,
                 merged_text="",
                 delta_text="",
                 no_speech_probs=[],
-                reasons=["insufficient_window"],
+                reasons=reasons + [REASON_INSUFFICIENT_WINDOW],
                 asr_duration_sec=0.0,
                 audio_duration_sec=active_samples / self.sample_rate,
                 cut_from_sec=None,
@@ -126,34 +490,41 @@ class ASREngine:
                 vad_ran=False,
             )
 
-        buffer = self.audio_cache[self.start_idx:self.end_idx].copy()
+        start_ns = self.profiler.now()
+        copied_bytes = self.audio_cache.copied_bytes
+        buffer = self.audio_cache.window(self.start_idx, self.end_idx)
+        self.last_copied_bytes = self.audio_cache.copied_bytes - copied_bytes
+        start_ns = self.profiler.lap(STAGE_WINDOW, start_ns)
 
         no_speech_probs: list[float] = []
-        reasons: list[str] = []
         vad_ran = False
 
         if not self.is_speech:
-            vad_ran = True
-            detect_segments, _ = self.vad_model.transcribe(
+            speech_detected = False
+            if is_silent(
                 buffer,
-                language="ja",
-                without_timestamps=True,
-                condition_on_previous_text=False,
-            )
-            detect_results = list(detect_segments)
-            no_speech_probs = [segment.no_speech_prob for segment in detect_results]
-
-            if len(detect_results) == 0 or all(
-                prob > self.vad_no_speech_threshold for prob in no_speech_probs
+                self.energy_frame_samples,
+                rms_threshold=self.energy_gate_rms,
+                peak_threshold=self.energy_gate_peak,
             ):
+                reasons.append(REASON_ENERGY_GATE)
+            else:
+                vad_ran = True
+                speech_detected, no_speech_probs = self.vad_backend.detect(
+                    buffer, window_start_idx
+                )
+                if not speech_detected:
+                    reasons.append(REASON_VAD_NO_SPEECH)
+            start_ns = self.profiler.lap(STAGE_VAD, start_ns)
+
+            if not speech_detected:
                 self.last_merged_text = ""
                 self.same_merged_count = 0
                 self.start_idx = self.end_idx
                 self.initial_prompt = ""
                 self.is_speech = False
-                reasons.append("vad_no_speech")
                 return self._build_result(
-                    status="no_speech",
+                    status=STATUS_NO_SPEECH,
                     merged_text="",
                     delta_text="",
                     no_speech_probs=no_speech_probs,
@@ -168,47 +539,112 @@ class ASREngine:
                 )
             self.is_speech = True
 
-        start_time = time.time()
-        asr_segments, info = self.asr_model.transcribe(
-            buffer,
-            language="ja",
-            word_timestamps=True,
-            condition_on_previous_text=False,
-            initial_prompt=self.initial_prompt,
-        )
+        trailing_silence_sec = 0.0
+        if self.endpoint_silence_sec is not None:
+            trailing_silence_sec = self._track_trailing_silence(window_start_idx, window_end_idx)
+            self.profiler.lap(STAGE_ENDPOINT, start_ns)
 
+        self.pending_asr = {
+            "window": buffer,
+            "window_start_idx": window_start_idx,
+            "window_end_idx": window_end_idx,
+            "no_speech_probs": no_speech_probs,
+            "reasons": reasons,
+            "vad_ran": vad_ran,
+            "trailing_silence_sec": trailing_silence_sec,
+        }
+        return None
+
+    def _track_trailing_silence(self, window_start_idx: int, window_end_idx: int) -> float:
+        """
+        返回窗口末尾连续静音的时长；窗口内没有语音帧时返回 0。只处理上次之后新到达的音频。
+        VAD 后端提供帧级判定（SileroVAD.speech_frames）时按其逐帧语音概率判定，
+        不受低音量语音与稳定背景噪声影响；否则（如 WhisperVAD）回退为按 endpoint_rms_threshold
+        判定的帧能量。
+        """
+        tracked_idx = max(self.endpoint_tracked_idx, window_start_idx)
+        if window_end_idx > tracked_idx:
+            # 用 read() 复制新音频，避免覆盖 window() 的拼接区（待识别窗口可能正指向它）
+            samples = self.audio_cache.read(tracked_idx, window_end_idx)
+            frames = self.vad_backend.speech_frames(samples, tracked_idx)
+            if frames is not None:
+                for frame_end_idx, is_speech in frames:
+                    if is_speech:
+                        self.last_speech_end_idx = frame_end_idx
+                tracked_idx = window_end_idx
+            else:
+                frame_samples = self.energy_frame_samples
+                n_frames = len(samples) // frame_samples
+                if n_frames > 0:
+                    new_end_idx = tracked_idx + n_frames * frame_samples
+                    rms, _ = frame_energy(samples[: n_frames * frame_samples], frame_samples)
+                    speech_frames = np.flatnonzero(rms >= self.endpoint_rms_threshold)
+                    if len(speech_frames) > 0:
+                        self.last_speech_end_idx = tracked_idx + (speech_frames[-1] + 1) * frame_samples
+                    tracked_idx = new_end_idx
+        self.endpoint_tracked_idx = tracked_idx
+
+        if self.last_speech_end_idx <= window_start_idx:
+            return 0.0
+        return (tracked_idx - self.last_speech_end_idx) / self.sample_rate
+
+    def complete_asr(
+        self,
+        segments: list[Any],
+        audio_duration_sec: float,
+        start_time: float,
+        *,
+        partial_only: bool = False,
+        min_cut_idx: int | None = None,
+    ) -> ASRResult | None:
+        # partial_only: 结果需要提交时不改动窗口，把切点写入 pending["commit_idx"] 并返回 None
+        # min_cut_idx: 至少提交到该位置（两级解码中由小模型决定的切点）
+        pending = self.pending_asr
+        if pending is None:
+            raise RuntimeError("complete_asr called without a pending window")
+        self.pending_asr = None
+        reasons = pending["reasons"]
+
+        start_ns = self.profiler.now()
         prev_end = 0.0
         next_start_idx = self.start_idx
+        time_origin_idx = pending.get("time_origin_idx", self.start_idx)
         merged_text_parts: list[str] = []
-        for segment in list(asr_segments):
+        for segment in segments:
             merged_text_parts.append(segment.text)
             if segment.start != prev_end:
                 cut_sec = (segment.start + prev_end) / 2
-                candidate_start_idx = self.start_idx + int(cut_sec * self.sample_rate)
+                candidate_start_idx = time_origin_idx + int(cut_sec * self.sample_rate)
                 next_start_idx = max(next_start_idx, candidate_start_idx)
-                reasons.append("segment_gap")
+                reasons.append(REASON_SEGMENT_GAP)
 
             segment_duration = segment.end - segment.start
             if segment_duration > self.max_sentence_sec:
                 next_start_idx = max(next_start_idx, self.end_idx)
-                reasons.append("long_segment")
+                reasons.append(REASON_LONG_SEGMENT)
             prev_end = segment.end
 
         merged_text = "".join(merged_text_parts).strip()
-        delta_text = get_changed_part(
-            self.last_valid_text.replace(" ", "").replace("\n", ""),
-            merged_text.replace(" ", "").replace("\n", ""),
-        )
+        start_ns = self.profiler.lap(STAGE_SEGMENTS, start_ns)
+        delta_reference = self.last_valid_text.replace(" ", "").replace("\n", "")
+        delta_text = get_changed_part(delta_reference, merged_text.replace(" ", "").replace("\n", ""))
+        self.profiler.lap(STAGE_DIFF, start_ns)
 
-        for item in self.hallucination_blacklist:
-            if item in delta_text:
-                merged_text = merged_text.replace(item, "")
-                delta_text = delta_text.replace(item, "")
-                reasons.append("hallucination_removed")
+        filter_duration_sec = 0.0
+        hits: list[int] = []
+        if self.hallucination_filter:
+            filter_start_ns = time.perf_counter_ns()
+            delta_text, hits = self.hallucination_filter.remove(delta_text)
+            if hits:
+                merged_text = self.strip_hallucinations(merged_text, hits)
+                reasons.extend([REASON_HALLUCINATION_REMOVED] * len(hits))
+            filter_end_ns = time.perf_counter_ns()
+            filter_duration_sec = (filter_end_ns - filter_start_ns) / 1e9
+            self.profiler.record(STAGE_FILTER, filter_start_ns, filter_end_ns)
 
         if not merged_text:
             next_start_idx = self.end_idx
-            reasons.append("empty_after_filter")
+            reasons.append(REASON_EMPTY_AFTER_FILTER)
 
         if merged_text:
             self.last_valid_text = merged_text
@@ -221,68 +657,128 @@ class ASREngine:
             self.last_merged_text = ""
             self.same_merged_count = 0
 
+        if (
+            self.endpoint_silence_sec is not None
+            and pending["trailing_silence_sec"] >= self.endpoint_silence_sec
+        ):
+            # 语音之后已出现足够长的静音，不必等待多次相同的识别结果
+            next_start_idx = max(next_start_idx, self.end_idx)
+            reasons.append(REASON_ENDPOINT_SILENCE)
+
         if self.same_merged_count >= self.stable_repeat_threshold and prev_end > 0:
             next_start_idx = max(next_start_idx, self.end_idx)
-            reasons.append(f"stable_x{self.same_merged_count}")
+            reasons.append(counted_reason(REASON_STABLE, self.same_merged_count))
+
+        agreed_end_idx = None
+        if self.commit_policy == "local_agreement" and merged_text:
+            words = [
+                (
+                    time_origin_idx + int(word.start * self.sample_rate),
+                    min(time_origin_idx + int(word.end * self.sample_rate), self.end_idx),
+                    word.word,
+                )
+                for segment in segments
+                for word in segment.words or []
+            ]
+            agreed = 0
+            previous = self.previous_hypothesis
+            if min_cut_idx is not None:
+                # 切点已定，提交切点之前开始的词
+                while agreed < len(words) and words[agreed][0] < min_cut_idx:
+                    agreed += 1
+            elif previous is not None and previous[0] == self.start_idx:
+                previous_words = previous[1]
+                limit = min(len(previous_words), len(words))
+                while agreed < limit and previous_words[agreed][2].strip() == words[agreed][2].strip():
+                    agreed += 1
+            self.previous_hypothesis = (self.start_idx, words)
+            # 连续两次识别一致的前缀视为稳定，只要它比其它规则切得更远就提交这部分
+            if agreed > 0 and words[agreed - 1][1] > next_start_idx:
+                agreed_end_idx = words[agreed - 1][1]
+                next_start_idx = agreed_end_idx
+                reasons.append(counted_reason(REASON_LOCAL_AGREEMENT, agreed))
+
+        if min_cut_idx is not None:
+            next_start_idx = max(next_start_idx, min_cut_idx)
 
         old_start_idx = self.start_idx
         cut_from_sec = None
         cut_to_sec = None
-        status = "partial"
+        status = STATUS_PARTIAL
         if (next_start_idx - self.start_idx) / self.sample_rate > self.min_cut_sec:
+            if partial_only:
+                pending["commit_idx"] = next_start_idx
+                return None
             self.start_idx = max(next_start_idx, self.start_idx)
-            self.initial_prompt = self.last_merged_text[-self.prompt_tail_chars :]
+            if agreed_end_idx is not None:
+                # 只提交一致的前缀，其余词留在窗口里作为下一次比对的基准
+                committed_text = "".join(word for _, _, word in words[:agreed]).strip()
+                if hits:
+                    committed_text = self.strip_hallucinations(committed_text, hits)
+                remaining = words[agreed:]
+                merged_text = committed_text
+                # 增量也只相对已提交的前缀计算，未达成一致的部分不下发
+                delta_text = get_changed_part(
+                    delta_reference, committed_text.replace(" ", "").replace("\n", "")
+                )
+                self.initial_prompt = (self.initial_prompt + committed_text)[-self.prompt_tail_chars :]
+                self.last_valid_text = "".join(word for _, _, word in remaining).strip()
+                self.last_merged_text = ""
+                self.same_merged_count = 0
+                self.previous_hypothesis = (self.start_idx, remaining)
+            else:
+                self.initial_prompt = self.last_merged_text[-self.prompt_tail_chars :]
+                self.previous_hypothesis = None
             if self.start_idx == self.end_idx:
                 self.is_speech = False
             cut_from_sec = old_start_idx / self.sample_rate
             cut_to_sec = self.start_idx / self.sample_rate
-            status = "committed"
+            status = STATUS_COMMITTED
 
-        asr_duration_sec = time.time() - start_time
-        audio_duration_sec = info.duration if info.duration > 0 else 0.0
+        asr_duration_sec = time.perf_counter() - start_time
+        audio_duration_sec = audio_duration_sec if audio_duration_sec > 0 else 0.0
 
         return self._build_result(
             status=status,
             merged_text=merged_text,
             delta_text=delta_text,
-            no_speech_probs=no_speech_probs,
+            no_speech_probs=pending["no_speech_probs"],
             reasons=reasons,
             asr_duration_sec=asr_duration_sec,
             audio_duration_sec=audio_duration_sec,
             cut_from_sec=cut_from_sec,
             cut_to_sec=cut_to_sec,
-            window_start_idx=window_start_idx,
-            window_end_idx=window_end_idx,
-            vad_ran=vad_ran,
+            window_start_idx=pending["window_start_idx"],
+            window_end_idx=pending["window_end_idx"],
+            vad_ran=pending["vad_ran"],
+            filter_duration_sec=filter_duration_sec,
         )
 
-    def finalize(self) -> dict[str, Any]:
+    def finalize(self, pending_samples: int = 0) -> ASRResult:
+        # pending_samples：调用方（如 FrameAccumulator）中尚未推入引擎的尾部采样点数
         active_samples = self.end_idx - self.start_idx
         tail_samples = active_samples if active_samples < self.one_second_samples else 0
-        return {
-            "status": "tail",
-            "tail_samples": tail_samples,
-            "tail_duration_sec": tail_samples / self.sample_rate,
-            "time": {
-                "window_start_sec": self.start_idx / self.sample_rate,
-                "window_end_sec": self.end_idx / self.sample_rate,
-                "cut_from_sec": None,
-                "cut_to_sec": None,
-            },
-            "text": {
-                "merged": "",
-                "delta": "",
-                "last_valid": self.last_valid_text,
-                "prompt": self.initial_prompt,
-            },
-            "vad": {"ran": False, "no_speech_probs": []},
-            "metrics": {
-                "asr_duration_sec": 0.0,
-                "audio_duration_sec": 0.0,
-                "rtf": 0.0,
-            },
-            "debug": {"reasons": ["finalize"]},
-        }
+        tail_samples += pending_samples
+        return ASRResult(
+            STATUS_TAIL,
+            tail_samples=tail_samples,
+            tail_duration_sec=tail_samples / self.sample_rate,
+            window_start_sec=self.start_idx / self.sample_rate,
+            window_end_sec=self.end_idx / self.sample_rate,
+            last_valid=self.last_valid_text,
+            prompt=self.initial_prompt,
+            reasons=[REASON_FINALIZE],
+        )
+
+    def strip_hallucinations(self, text: str, hits: list[int]) -> str:
+        """
+        与原实现一致：只移除在增量文本里命中的黑名单文本（hits 为模式串下标）。
+        长的先移除，避免嵌套的短模式串（如 "ご視聴" 之于 "ご視聴ありがとう"）先把长的拆开。
+        """
+        patterns = self.hallucination_filter.patterns
+        for idx in sorted(hits, key=lambda idx: len(patterns[idx]), reverse=True):
+            text = text.replace(patterns[idx], "")
+        return text
 
     def _build_result(
         self,
@@ -299,39 +795,31 @@ class ASREngine:
         window_start_idx: int,
         window_end_idx: int,
         vad_ran: bool,
-    ) -> dict[str, Any]:
-        rtf = asr_duration_sec / audio_duration_sec if audio_duration_sec > 0 else 0.0
-        return {
-            "status": status,
-            "time": {
-                "window_start_sec": window_start_idx / self.sample_rate,
-                "window_end_sec": window_end_idx / self.sample_rate,
-                "cut_from_sec": cut_from_sec,
-                "cut_to_sec": cut_to_sec,
-            },
-            "text": {
-                "merged": merged_text,
-                "delta": delta_text,
-                "last_valid": self.last_valid_text,
-                "prompt": self.initial_prompt,
-            },
-            "vad": {
-                "ran": vad_ran,
-                "no_speech_probs": no_speech_probs,
-            },
-            "metrics": {
-                "asr_duration_sec": asr_duration_sec,
-                "audio_duration_sec": audio_duration_sec,
-                "rtf": rtf,
-            },
-            "buffer": {
-                "cache_samples": len(self.audio_cache),
-                "active_samples": self.end_idx - self.start_idx,
-                "tail_samples": max(0, self.end_idx - self.start_idx),
-            },
-            "debug": {
-                "reasons": reasons,
-                "same_merged_count": self.same_merged_count,
-                "is_speech": self.is_speech,
-            },
-        }
+        filter_duration_sec: float = 0.0,
+    ) -> ASRResult:
+        active_samples = self.end_idx - self.start_idx
+        return ASRResult(
+            status,
+            window_start_sec=window_start_idx / self.sample_rate,
+            window_end_sec=window_end_idx / self.sample_rate,
+            cut_from_sec=cut_from_sec,
+            cut_to_sec=cut_to_sec,
+            merged=merged_text,
+            delta=delta_text,
+            last_valid=self.last_valid_text,
+            prompt=self.initial_prompt,
+            vad_ran=vad_ran,
+            no_speech_probs=no_speech_probs,
+            asr_duration_sec=asr_duration_sec,
+            audio_duration_sec=audio_duration_sec,
+            filter_duration_sec=filter_duration_sec,
+            cache_samples=len(self.audio_cache),
+            capacity_samples=self.audio_cache.capacity,
+            copied_bytes=self.last_copied_bytes,
+            total_copied_bytes=self.audio_cache.copied_bytes,
+            active_samples=active_samples,
+            tail_samples=max(0, active_samples),
+            reasons=reasons,
+            same_merged_count=self.same_merged_count,
+            is_speech=self.is_speech,
+        )
@@ -0,0 +1,229 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from asr_result import (
+    REASON_LOCAL_AGREEMENT,
+    REASON_STABLE,
+    REASONS,
+    STATUS_COMMITTED,
+    STATUS_PARTIAL,
+    STATUSES,
+    ASRResult,
+    split_reason,
+)
+from utils.latency import process_snapshot
+
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+RTF_BUCKETS = (0.05, 0.1, 0.2, 0.3, 0.5, 0.75, 1.0, 1.5, 2.0)
+WINDOW_BUCKETS_SEC = (1.0, 2.0, 3.0, 5.0, 8.0, 12.0, 16.0, 20.0, 25.0, 30.0)
+# 带计数的原因（stable_x3、local_agreement_x17）只以基本原因作标签，计数另记入直方图
+COUNTED_REASONS = (REASON_STABLE, REASON_LOCAL_AGREEMENT)
+REASON_COUNT_BUCKETS = (1.0, 2.0, 3.0, 4.0, 6.0, 8.0, 12.0, 16.0, 24.0, 32.0)
+# 不在 REASONS 中的原因统一计入该标签，保证标签集合有限
+REASON_OTHER = "other"
+
+
+class Histogram:
+    """
+    Prometheus 风格的累积直方图：buckets 为各桶上界（le），另含 +Inf、_sum 与 _count。
+    """
+
+    def __init__(self, buckets: tuple[float, ...]) -> None:
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.total = 0.0
+
+    def observe(self, value: float) -> None:
+        index = 0
+        while index < len(self.buckets) and value > self.buckets[index]:
+            index += 1
+        self.counts[index] += 1
+        self.total += value
+
+    def copy(self) -> "Histogram":
+        histogram = Histogram(self.buckets)
+        histogram.counts = list(self.counts)
+        histogram.total = self.total
+        return histogram
+
+    def render(self, name: str, labels: str = "") -> list[str]:
+        """
+        labels 为附加的标签，如 'reason="stable"'。
+        """
+        prefix = f"{labels}," if labels else ""
+        suffix = f"{{{labels}}}" if labels else ""
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{{{prefix}le="{bound}"}} {cumulative}')
+        cumulative += self.counts[-1]
+        lines.append(f'{name}_bucket{{{prefix}le="+Inf"}} {cumulative}')
+        lines.append(f"{name}_sum{suffix} {self.total}")
+        lines.append(f"{name}_count{suffix} {cumulative}")
+        return lines
+
+
+class ASRMetrics:
+    """
+    流式识别服务的进程内指标，由网关在每个会话开始、结束以及每次拿到 ASRResult 时更新。
+    所有更新只在锁内做常数次整数加法；render() 先在锁内复制计数再在锁外格式化，
+    因此抓取指标不会阻塞音频处理路径。
+    阶段耗时取自本进程的 utils.latency.process_snapshot()；--multiprocess 模式下引擎运行在
+    Worker 进程中，网关进程的 /metrics 不包含阶段耗时。
+    """
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.active_sessions = 0
+        self.pushes = {status: 0 for status in STATUSES}
+        self.vad_invocations = 0
+        self.asr_invocations = 0
+        self.rtf = Histogram(RTF_BUCKETS)
+        self.window_sec = Histogram(WINDOW_BUCKETS_SEC)
+        # session_id -> 最近一次结果中环形缓冲区持有的采样点数
+        self.buffer_samples: dict[str, int] = {}
+        self.reasons = {reason: 0 for reason in REASONS}
+        self.reason_counts = {reason: Histogram(REASON_COUNT_BUCKETS) for reason in COUNTED_REASONS}
+
+    def open_session(self, session_id: str) -> None:
+        with self.lock:
+            self.active_sessions += 1
+
+    def close_session(self, session_id: str) -> None:
+        with self.lock:
+            self.active_sessions -= 1
+            self.buffer_samples.pop(session_id, None)
+
+    def observe(self, session_id: str, result: ASRResult) -> None:
+        asr_ran = result.status in (STATUS_PARTIAL, STATUS_COMMITTED)
+        window_sec = result.window_end_sec - result.window_start_sec
+        with self.lock:
+            self.pushes[result.status] = self.pushes.get(result.status, 0) + 1
+            if result.vad_ran:
+                self.vad_invocations += 1
+            if asr_ran:
+                self.asr_invocations += 1
+                self.rtf.observe(result.rtf)
+                self.window_sec.observe(window_sec)
+            self.buffer_samples[session_id] = result.cache_samples
+            for reason in result.reasons:
+                try:
+                    reason, count = split_reason(reason)
+                except ValueError:
+                    reason, count = REASON_OTHER, 0
+                self.reasons[reason] = self.reasons.get(reason, 0) + 1
+                if count:
+                    self.reason_counts[reason].observe(count)
+
+    def render(self) -> str:
+        with self.lock:
+            active_sessions = self.active_sessions
+            pushes = dict(self.pushes)
+            vad_invocations = self.vad_invocations
+            asr_invocations = self.asr_invocations
+            rtf = self.rtf.copy()
+            window_sec = self.window_sec.copy()
+            buffer_samples = sum(self.buffer_samples.values())
+            reasons = dict(self.reasons)
+            reason_counts = {
+                reason: histogram.copy() for reason, histogram in self.reason_counts.items()
+            }
+
+        lines = [
+            "# HELP asr_active_sessions Streaming sessions currently open.",
+            "# TYPE asr_active_sessions gauge",
+            f"asr_active_sessions {active_sessions}",
+            "# HELP asr_pushes_total Engine results by status.",
+            "# TYPE asr_pushes_total counter",
+        ]
+        lines.extend(
+            f'asr_pushes_total{{status="{status}"}} {count}' for status, count in pushes.items()
+        )
+        lines += [
+            "# HELP asr_invocations_total Model invocations by kind.",
+            "# TYPE asr_invocations_total counter",
+            f'asr_invocations_total{{kind="vad"}} {vad_invocations}',
+            f'asr_invocations_total{{kind="asr"}} {asr_invocations}',
+            "# HELP asr_rtf Real-time factor of each ASR pass.",
+            "# TYPE asr_rtf histogram",
+            *rtf.render("asr_rtf"),
+            "# HELP asr_window_seconds Audio window length of each ASR pass.",
+            "# TYPE asr_window_seconds histogram",
+            *window_sec.render("asr_window_seconds"),
+            "# HELP asr_buffer_samples Audio samples held in session ring buffers.",
+            "# TYPE asr_buffer_samples gauge",
+            f"asr_buffer_samples {buffer_samples}",
+            "# HELP asr_reasons_total Decision reasons reported in debug.reasons.",
+            "# TYPE asr_reasons_total counter",
+        ]
+        lines.extend(
+            f'asr_reasons_total{{reason="{reason}"}} {count}' for reason, count in reasons.items()
+        )
+        lines += [
+            "# HELP asr_reason_count Count attached to counted reasons (stable_xN, local_agreement_xN).",
+            "# TYPE asr_reason_count histogram",
+        ]
+        for reason, histogram in reason_counts.items():
+            lines.extend(histogram.render("asr_reason_count", f'reason="{reason}"'))
+
+        # 本进程内引擎的阶段耗时（ASREngine(profile_stages=True) 时才有数据）
+        stages = process_snapshot()
+        if stages:
+            lines += [
+                "# HELP asr_stage_latency_seconds Per-stage engine latency quantiles.",
+                "# TYPE asr_stage_latency_seconds summary",
+            ]
+            for stage, snapshot in stages.items():
+                for quantile, key in (("0.5", "p50_ms"), ("0.95", "p95_ms"), ("0.99", "p99_ms")):
+                    lines.append(
+                        f'asr_stage_latency_seconds{{stage="{stage}",quantile="{quantile}"}} '
+                        f"{snapshot[key] / 1000}"
+                    )
+                lines.append(
+                    f'asr_stage_latency_seconds_sum{{stage="{stage}"}} '
+                    f"{snapshot['mean_ms'] * snapshot['count'] / 1000}"
+                )
+                lines.append(f'asr_stage_latency_seconds_count{{stage="{stage}"}} {snapshot["count"]}')
+        return "\n".join(lines) + "\n"
+
+
+class MetricsServer:
+    """
+    在后台线程中提供 GET /metrics 的 HTTP 服务；port=0 时由系统分配端口，见 self.port。
+    """
+
+    def __init__(self, metrics: ASRMetrics, host: str = "0.0.0.0", port: int = 9100) -> None:
+        self.metrics = metrics
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self) -> None:
+                if self.path.split("?", 1)[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = metrics.render().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", CONTENT_TYPE)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format: str, *args) -> None:
+                # 抓取请求频繁，不写访问日志
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        self.port = self.server.server_address[1]
+        self.thread = threading.Thread(
+            target=self.server.serve_forever, name="metrics-http", daemon=True
+        )
+
+    def start(self) -> "MetricsServer":
+        self.thread.start()
+        return self
+
+    def close(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
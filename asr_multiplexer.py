@@ -0,0 +1,314 @@
+import time
+from collections import deque
+from typing import Any, Callable, NamedTuple
+
+import numpy as np
+from faster_whisper import WhisperModel
+from faster_whisper.audio import pad_or_trim
+from faster_whisper.tokenizer import Tokenizer
+from faster_whisper.transcribe import get_suppressed_tokens
+
+from asr_engine import ASREngine
+from asr_result import ASRResult
+from utils.latency import STAGE_ASR, STAGE_QUEUE
+from utils.trace import ChromeTracer
+from vad_engine import VADBackend
+
+
+class BatchWord(NamedTuple):
+    start: float
+    end: float
+    word: str
+    probability: float
+
+
+class BatchSegment(NamedTuple):
+    start: float
+    end: float
+    text: str
+    no_speech_prob: float
+    avg_logprob: float
+    words: list[BatchWord]
+
+
+class SequentialTranscriber:
+    def __init__(self, model: WhisperModel, *, language: str = "ja") -> None:
+        self.model = model
+        self.language = language
+
+    def transcribe(self, windows: list[np.ndarray], prompts: list[str]) -> list[list[Any]]:
+        outputs = []
+        for window, prompt in zip(windows, prompts):
+            segments, _ = self.model.transcribe(
+                window,
+                language=self.language,
+                word_timestamps=True,
+                condition_on_previous_text=False,
+                initial_prompt=prompt,
+            )
+            outputs.append(list(segments))
+        return outputs
+
+
+class WhisperBatchTranscriber:
+    def __init__(
+        self,
+        model: WhisperModel,
+        *,
+        language: str = "ja",
+        beam_size: int = 5,
+        word_timestamps: bool = True,
+        no_speech_threshold: float = 0.6,
+        log_prob_threshold: float = -1.0,
+        prepend_punctuations: str = "\"'“¿([{-",
+        append_punctuations: str = "\"'.。,，!！?？:：”)]}、",
+    ) -> None:
+        self.model = model
+        self.tokenizer = Tokenizer(
+            model.hf_tokenizer,
+            model.model.is_multilingual,
+            task="transcribe",
+            language=language,
+        )
+        self.suppress_tokens = get_suppressed_tokens(self.tokenizer, [-1])
+        self.max_initial_timestamp_index = int(round(1.0 / model.time_precision))
+        self.beam_size = beam_size
+        self.word_timestamps = word_timestamps
+        self.no_speech_threshold = no_speech_threshold
+        self.log_prob_threshold = log_prob_threshold
+        self.prepend_punctuations = prepend_punctuations
+        self.append_punctuations = append_punctuations
+
+    def transcribe(self, windows: list[np.ndarray], prompts: list[str]) -> list[list[BatchSegment]]:
+        feature_extractor = self.model.feature_extractor
+        features = np.stack(
+            [pad_or_trim(feature_extractor(window), feature_extractor.nb_max_frames) for window in windows]
+        )
+        encoder_output = self.model.encode(features)
+        prompt_tokens = [
+            self.model.get_prompt(
+                self.tokenizer,
+                previous_tokens=self.tokenizer.encode(" " + prompt.strip()) if prompt else [],
+            )
+            for prompt in prompts
+        ]
+        results = self.model.model.generate(
+            encoder_output,
+            prompt_tokens,
+            beam_size=self.beam_size,
+            patience=1,
+            length_penalty=1,
+            max_length=self.model.max_length,
+            suppress_blank=True,
+            suppress_tokens=self.suppress_tokens,
+            max_initial_timestamp_index=self.max_initial_timestamp_index,
+            return_scores=True,
+            return_no_speech_prob=True,
+        )
+
+        batch_segments = []
+        segment_sizes = []
+        batch_stats = []
+        for window, result in zip(windows, results):
+            tokens = result.sequences_ids[0]
+            avg_logprob = result.scores[0] * len(tokens) / (len(tokens) + 1)
+            segment_size = min(
+                feature_extractor.nb_max_frames, len(window) // feature_extractor.hop_length
+            )
+            subsegments, _, _ = self.model._split_segments_by_timestamps(
+                tokenizer=self.tokenizer,
+                tokens=tokens,
+                time_offset=0.0,
+                segment_size=segment_size,
+                segment_duration=segment_size * feature_extractor.time_per_frame,
+                seek=0,
+            )
+            batch_segments.append(subsegments)
+            segment_sizes.append(segment_size)
+            batch_stats.append((result.no_speech_prob, avg_logprob))
+
+        if self.word_timestamps:
+            self.model.add_word_timestamps(
+                batch_segments,
+                self.tokenizer,
+                encoder_output,
+                segment_sizes,
+                self.prepend_punctuations,
+                self.append_punctuations,
+                0.0,
+            )
+
+        outputs = []
+        for subsegments, (no_speech_prob, avg_logprob) in zip(batch_segments, batch_stats):
+            if no_speech_prob > self.no_speech_threshold and avg_logprob <= self.log_prob_threshold:
+                outputs.append([])
+                continue
+            segments = []
+            for subsegment in subsegments:
+                text_tokens = [token for token in subsegment["tokens"] if token < self.tokenizer.eot]
+                text = self.tokenizer.decode(text_tokens)
+                if not text.strip():
+                    continue
+                words = [
+                    BatchWord(word["start"], word["end"], word["word"], word["probability"])
+                    for word in subsegment.get("words", [])
+                ]
+                segments.append(
+                    BatchSegment(
+                        start=subsegment["start"],
+                        end=subsegment["end"],
+                        text=text,
+                        no_speech_prob=no_speech_prob,
+                        avg_logprob=avg_logprob,
+                        words=words,
+                    )
+                )
+            outputs.append(segments)
+        return outputs
+
+
+class MultiSessionASREngine:
+    def __init__(
+        self,
+        asr_model: WhisperModel | None = None,
+        vad_model: WhisperModel | None = None,
+        *,
+        asr_model_path: str | None = None,
+        vad_model_path: str | None = None,
+        device: str = "cuda",
+        max_batch_size: int = 8,
+        max_wait_sec: float = 0.1,
+        transcriber: Any | None = None,
+        vad_backend_factory: Callable[[], VADBackend] | None = None,
+        tracer: ChromeTracer | None = None,
+        **engine_kwargs: Any,
+    ) -> None:
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be >= 1")
+        if asr_model is None:
+            if not asr_model_path:
+                raise ValueError("asr_model or asr_model_path is required")
+            asr_model = WhisperModel(asr_model_path, device=device)
+        if vad_model is None and vad_backend_factory is None:
+            if not vad_model_path:
+                raise ValueError("vad_backend_factory, vad_model or vad_model_path is required")
+            vad_model = WhisperModel(vad_model_path, device=device)
+
+        self.asr_model = asr_model
+        self.vad_model = vad_model
+        self.transcriber = transcriber or WhisperBatchTranscriber(asr_model)
+        self.vad_backend_factory = vad_backend_factory
+        self.max_batch_size = max_batch_size
+        self.max_wait_sec = max_wait_sec
+        # 设置后每个会话的引擎都把阶段写入 tracer，轨道名为 session_id
+        self.tracer = tracer
+        # 批量转写由 transcriber 自行提取特征，会话引擎不需要增量 mel 缓存
+        engine_kwargs.setdefault("feature_cache", False)
+        self.engine_kwargs = engine_kwargs
+
+        self.sessions: dict[str, ASREngine] = {}
+        self.inboxes: dict[str, deque[np.ndarray]] = {}
+        # session_id -> None，按插入顺序记录有待处理音频的会话
+        self.dirty: dict[str, None] = {}
+        # session_id -> 进入就绪队列的时间，按插入顺序即为等待先后
+        self.ready: dict[str, float] = {}
+        # session_id -> 进入就绪队列时的 perf_counter_ns（只在引擎开启阶段计时时记录）
+        self.ready_ns: dict[str, int] = {}
+
+    def open_session(self, session_id: str) -> ASREngine:
+        if session_id in self.sessions:
+            raise ValueError(f"session {session_id} already exists")
+        engine = ASREngine(
+            self.asr_model,
+            self.vad_model,
+            vad_backend=self.vad_backend_factory() if self.vad_backend_factory else None,
+            **self.engine_kwargs,
+        )
+        if self.tracer is not None:
+            engine.profiler.trace(self.tracer, session_id)
+        self.sessions[session_id] = engine
+        self.inboxes[session_id] = deque()
+        return engine
+
+    def close_session(self, session_id: str) -> None:
+        self.sessions.pop(session_id, None)
+        self.inboxes.pop(session_id, None)
+        self.dirty.pop(session_id, None)
+        self.ready.pop(session_id, None)
+        self.ready_ns.pop(session_id, None)
+
+    def push_chunk(self, session_id: str, chunk: np.ndarray) -> None:
+        self.inboxes[session_id].append(chunk)
+        self.dirty[session_id] = None
+
+    def pending_sessions(self) -> int:
+        return len(self.ready)
+
+    def tick(self, now: float | None = None, flush: bool = False) -> list[tuple[str, ASRResult]]:
+        now = time.monotonic() if now is None else now
+        results: list[tuple[str, ASRResult]] = []
+
+        for session_id in list(self.dirty):
+            if session_id in self.ready:
+                continue
+            engine = self.sessions[session_id]
+            inbox = self.inboxes[session_id]
+            while inbox:
+                try:
+                    result = engine.prepare_chunk(inbox.popleft())
+                except Exception as exc:
+                    result = engine.build_error_result(exc)
+                if result is None:
+                    self.ready[session_id] = now
+                    self.ready_ns[session_id] = engine.profiler.now()
+                    break
+                results.append((session_id, result))
+            if not inbox:
+                del self.dirty[session_id]
+
+        while self.ready:
+            oldest = next(iter(self.ready.values()))
+            if not (
+                flush
+                or len(self.ready) >= self.max_batch_size
+                or now - oldest >= self.max_wait_sec
+            ):
+                break
+            results.extend(self._run_batch())
+        return results
+
+    def _run_batch(self) -> list[tuple[str, ASRResult]]:
+        session_ids = list(self.ready)[: self.max_batch_size]
+        queued_ns = []
+        for session_id in session_ids:
+            del self.ready[session_id]
+            queued_ns.append(self.ready_ns.pop(session_id, 0))
+        engines = [self.sessions[session_id] for session_id in session_ids]
+        windows = [engine.pending_asr["window"] for engine in engines]
+        prompts = [engine.initial_prompt for engine in engines]
+
+        start_ns = time.perf_counter_ns()
+        start_time = start_ns / 1e9
+        try:
+            batch_segments = self.transcriber.transcribe(windows, prompts)
+        except Exception as exc:
+            return [
+                (session_id, engine.build_error_result(exc))
+                for session_id, engine in zip(session_ids, engines)
+            ]
+        end_ns = time.perf_counter_ns()
+        # 整批的耗时计入每个参与会话的 asr 阶段，组批前的等待计入 queue 阶段
+        for engine, ready_ns in zip(engines, queued_ns):
+            if ready_ns:
+                engine.profiler.record(STAGE_QUEUE, ready_ns, start_ns)
+            engine.profiler.record(STAGE_ASR, start_ns, end_ns)
+
+        results = []
+        for session_id, engine, window, segments in zip(session_ids, engines, windows, batch_segments):
+            try:
+                result = engine.complete_asr(segments, len(window) / engine.sample_rate, start_time)
+                result.set_metric("batch_size", len(session_ids))
+            except Exception as exc:
+                result = engine.build_error_result(exc)
+            results.append((session_id, result))
+        return results
@@ -0,0 +1,389 @@
+import json
+import math
+import struct
+from typing import Any
+
+
+STATUS_BUFFERING = "buffering"
+STATUS_NO_SPEECH = "no_speech"
+STATUS_PARTIAL = "partial"
+STATUS_COMMITTED = "committed"
+STATUS_ERROR = "error"
+STATUS_TAIL = "tail"
+
+REASON_BUFFER_OVERFLOW = "buffer_overflow"
+REASON_EMPTY_CHUNK = "empty_chunk"
+REASON_INSUFFICIENT_WINDOW = "insufficient_window"
+REASON_ENERGY_GATE = "energy_gate"
+REASON_VAD_NO_SPEECH = "vad_no_speech"
+REASON_SEGMENT_GAP = "segment_gap"
+REASON_LONG_SEGMENT = "long_segment"
+REASON_HALLUCINATION_REMOVED = "hallucination_removed"
+REASON_EMPTY_AFTER_FILTER = "empty_after_filter"
+REASON_ENDPOINT_SILENCE = "endpoint_silence"
+# 带计数的原因以 f"{name}_x{count}" 形式出现，如 stable_x3
+REASON_STABLE = "stable"
+REASON_LOCAL_AGREEMENT = "local_agreement"
+REASON_FINAL_PASS = "final_pass"
+REASON_ERROR = "error"
+REASON_FINALIZE = "finalize"
+
+# 二进制编码使用的编号，只能在末尾追加
+STATUS_CODES = {
+    status: code
+    for code, status in enumerate(
+        [
+            STATUS_BUFFERING,
+            STATUS_NO_SPEECH,
+            STATUS_PARTIAL,
+            STATUS_COMMITTED,
+            STATUS_ERROR,
+            STATUS_TAIL,
+        ]
+    )
+}
+REASON_CODES = {
+    reason: code
+    for code, reason in enumerate(
+        [
+            REASON_BUFFER_OVERFLOW,
+            REASON_EMPTY_CHUNK,
+            REASON_INSUFFICIENT_WINDOW,
+            REASON_ENERGY_GATE,
+            REASON_VAD_NO_SPEECH,
+            REASON_SEGMENT_GAP,
+            REASON_LONG_SEGMENT,
+            REASON_HALLUCINATION_REMOVED,
+            REASON_EMPTY_AFTER_FILTER,
+            REASON_ENDPOINT_SILENCE,
+            REASON_STABLE,
+            REASON_LOCAL_AGREEMENT,
+            REASON_FINAL_PASS,
+            REASON_ERROR,
+            REASON_FINALIZE,
+        ]
+    )
+}
+STATUSES = list(STATUS_CODES)
+REASONS = list(REASON_CODES)
+
+FLAG_VAD_RAN = 1
+FLAG_IS_SPEECH = 2
+BINARY_VERSION = 1
+# version, status, flags, same_merged_count, 8 个 float64 时间/耗时, 6 个 int64 缓冲区计数,
+# no_speech_probs 个数, reasons 个数, 6 段 UTF-8 字符串的字节数
+_HEADER = struct.Struct("<BBBI8d6q2H6I")
+_REASON = struct.Struct("<BH")
+
+
+def counted_reason(name: str, count: int) -> str:
+    return f"{name}_x{count}"
+
+
+def split_reason(reason: str) -> tuple[str, int]:
+    """
+    把原因拆成 (REASONS 中的基本原因, 计数)，不带计数的原因计数为 0；未知原因抛出 ValueError。
+    """
+    if reason in REASON_CODES:
+        return reason, 0
+    name, _, count = reason.rpartition("_x")
+    if name not in REASON_CODES or not count.isdigit():
+        raise ValueError(f"unknown result reason: {reason}")
+    return name, int(count)
+
+
+def _encode_reason(reason: str) -> tuple[int, int]:
+    name, count = split_reason(reason)
+    return REASON_CODES[name], count
+
+
+def _decode_reason(code: int, count: int) -> str:
+    return counted_reason(REASONS[code], count) if count else REASONS[code]
+
+
+class ASRResult:
+    """
+    ASREngine 每次推进的结果。所有字段平铺在 __slots__ 中，构造时不创建嵌套 dict；
+    只有真正发送时才通过 to_dict() / to_json() / to_protocol_json() / to_bytes() 序列化。
+    metrics 中引擎之外附加的指标（model、skipped_ticks 等）通过 set_metric() 存入 extra_metrics。
+    """
+
+    __slots__ = (
+        "status",
+        "error",
+        "window_start_sec",
+        "window_end_sec",
+        "cut_from_sec",
+        "cut_to_sec",
+        "merged",
+        "delta",
+        "last_valid",
+        "prompt",
+        "vad_ran",
+        "no_speech_probs",
+        "asr_duration_sec",
+        "audio_duration_sec",
+        "filter_duration_sec",
+        "tail_duration_sec",
+        "extra_metrics",
+        "cache_samples",
+        "capacity_samples",
+        "copied_bytes",
+        "total_copied_bytes",
+        "active_samples",
+        "tail_samples",
+        "reasons",
+        "same_merged_count",
+        "is_speech",
+    )
+
+    def __init__(
+        self,
+        status: str,
+        *,
+        error: str = "",
+        window_start_sec: float = 0.0,
+        window_end_sec: float = 0.0,
+        cut_from_sec: float | None = None,
+        cut_to_sec: float | None = None,
+        merged: str = "",
+        delta: str = "",
+        last_valid: str = "",
+        prompt: str = "",
+        vad_ran: bool = False,
+        no_speech_probs: list[float] | None = None,
+        asr_duration_sec: float = 0.0,
+        audio_duration_sec: float = 0.0,
+        filter_duration_sec: float = 0.0,
+        tail_duration_sec: float = 0.0,
+        extra_metrics: dict[str, Any] | None = None,
+        cache_samples: int = 0,
+        capacity_samples: int = 0,
+        copied_bytes: int = 0,
+        total_copied_bytes: int = 0,
+        active_samples: int = 0,
+        tail_samples: int = 0,
+        reasons: list[str] | None = None,
+        same_merged_count: int = 0,
+        is_speech: bool = False,
+    ) -> None:
+        self.status = status
+        self.error = error
+        self.window_start_sec = window_start_sec
+        self.window_end_sec = window_end_sec
+        self.cut_from_sec = cut_from_sec
+        self.cut_to_sec = cut_to_sec
+        self.merged = merged
+        self.delta = delta
+        self.last_valid = last_valid
+        self.prompt = prompt
+        self.vad_ran = vad_ran
+        self.no_speech_probs = [] if no_speech_probs is None else no_speech_probs
+        self.asr_duration_sec = asr_duration_sec
+        self.audio_duration_sec = audio_duration_sec
+        self.filter_duration_sec = filter_duration_sec
+        self.tail_duration_sec = tail_duration_sec
+        self.extra_metrics = extra_metrics
+        self.cache_samples = cache_samples
+        self.capacity_samples = capacity_samples
+        self.copied_bytes = copied_bytes
+        self.total_copied_bytes = total_copied_bytes
+        self.active_samples = active_samples
+        self.tail_samples = tail_samples
+        self.reasons = [] if reasons is None else reasons
+        self.same_merged_count = same_merged_count
+        self.is_speech = is_speech
+
+    def __repr__(self) -> str:
+        return (
+            f"ASRResult(status={self.status!r}, merged={self.merged!r}, "
+            f"window=[{self.window_start_sec:.2f}, {self.window_end_sec:.2f}], reasons={self.reasons!r})"
+        )
+
+    @property
+    def is_final(self) -> bool:
+        return self.status == STATUS_COMMITTED
+
+    @property
+    def rtf(self) -> float:
+        return self.asr_duration_sec / self.audio_duration_sec if self.audio_duration_sec > 0 else 0.0
+
+    def set_metric(self, name: str, value: Any) -> None:
+        if self.extra_metrics is None:
+            self.extra_metrics = {}
+        self.extra_metrics[name] = value
+
+    def get_metric(self, name: str, default: Any = None) -> Any:
+        if self.extra_metrics is None:
+            return default
+        return self.extra_metrics.get(name, default)
+
+    def to_dict(self) -> dict[str, Any]:
+        """
+        展开为与原先 _build_result 相同结构的嵌套 dict（error / tail 结果保持各自原有的字段）。
+        """
+        result: dict[str, Any] = {"status": self.status}
+        if self.status == STATUS_ERROR:
+            result["error"] = self.error
+        elif self.status == STATUS_TAIL:
+            result["tail_samples"] = self.tail_samples
+            result["tail_duration_sec"] = self.tail_duration_sec
+        result["time"] = {
+            "window_start_sec": self.window_start_sec,
+            "window_end_sec": self.window_end_sec,
+            "cut_from_sec": self.cut_from_sec,
+            "cut_to_sec": self.cut_to_sec,
+        }
+        result["text"] = {
+            "merged": self.merged,
+            "delta": self.delta,
+            "last_valid": self.last_valid,
+            "prompt": self.prompt,
+        }
+        result["vad"] = {"ran": self.vad_ran, "no_speech_probs": self.no_speech_probs}
+        metrics = {
+            "asr_duration_sec": self.asr_duration_sec,
+            "audio_duration_sec": self.audio_duration_sec,
+            "rtf": self.rtf,
+        }
+        if self.status in (STATUS_ERROR, STATUS_TAIL):
+            result["metrics"] = metrics
+            result["debug"] = {"reasons": self.reasons}
+            return result
+        metrics["filter_duration_sec"] = self.filter_duration_sec
+        if self.extra_metrics:
+            metrics.update(self.extra_metrics)
+        result["metrics"] = metrics
+        result["buffer"] = {
+            "cache_samples": self.cache_samples,
+            "capacity_samples": self.capacity_samples,
+            "copied_bytes": self.copied_bytes,
+            "total_copied_bytes": self.total_copied_bytes,
+            "active_samples": self.active_samples,
+            "tail_samples": self.tail_samples,
+        }
+        result["debug"] = {
+            "reasons": self.reasons,
+            "same_merged_count": self.same_merged_count,
+            "is_speech": self.is_speech,
+        }
+        return result
+
+    def to_json(self) -> str:
+        return json.dumps(self.to_dict(), ensure_ascii=False)
+
+    def to_protocol_json(
+        self,
+        session_id: str,
+        seq_no: int,
+        is_final: bool | None = None,
+        timestamp_ms: tuple[int, int] | None = None,
+    ) -> str:
+        """
+        直接序列化为协议的 result 消息；is_final 缺省按 status 判断，
+        timestamp_ms 为 (start, end)，缺省由窗口时间换算。
+        """
+        if timestamp_ms is None:
+            timestamp_ms = (round(self.window_start_sec * 1000), round(self.window_end_sec * 1000))
+        return json.dumps(
+            {
+                "type": "result",
+                "session_id": session_id,
+                "seq_no": seq_no,
+                "data": {
+                    "text": self.merged,
+                    "is_final": self.is_final if is_final is None else is_final,
+                    "confidence": None,
+                    "timestamp_ms": {"start": timestamp_ms[0], "end": timestamp_ms[1]},
+                },
+            },
+            ensure_ascii=False,
+        )
+
+    def to_bytes(self) -> bytes:
+        """
+        紧凑的二进制编码（用于进程间传递），可由 from_bytes() 无损还原。
+        """
+        strings = [
+            self.merged.encode(),
+            self.delta.encode(),
+            self.last_valid.encode(),
+            self.prompt.encode(),
+            self.error.encode(),
+            json.dumps(self.extra_metrics).encode() if self.extra_metrics else b"",
+        ]
+        flags = (FLAG_VAD_RAN if self.vad_ran else 0) | (FLAG_IS_SPEECH if self.is_speech else 0)
+        header = _HEADER.pack(
+            BINARY_VERSION,
+            STATUS_CODES[self.status],
+            flags,
+            self.same_merged_count,
+            self.window_start_sec,
+            self.window_end_sec,
+            math.nan if self.cut_from_sec is None else self.cut_from_sec,
+            math.nan if self.cut_to_sec is None else self.cut_to_sec,
+            self.asr_duration_sec,
+            self.audio_duration_sec,
+            self.filter_duration_sec,
+            self.tail_duration_sec,
+            self.cache_samples,
+            self.capacity_samples,
+            self.copied_bytes,
+            self.total_copied_bytes,
+            self.active_samples,
+            self.tail_samples,
+            len(self.no_speech_probs),
+            len(self.reasons),
+            *(len(s) for s in strings),
+        )
+        probs = struct.pack(f"<{len(self.no_speech_probs)}d", *self.no_speech_probs)
+        reasons = b"".join(_REASON.pack(*_encode_reason(reason)) for reason in self.reasons)
+        return b"".join([header, probs, reasons, *strings])
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "ASRResult":
+        fields = _HEADER.unpack_from(data)
+        if fields[0] != BINARY_VERSION:
+            raise ValueError(f"unsupported ASRResult encoding version: {fields[0]}")
+        offset = _HEADER.size
+        n_probs, n_reasons = fields[18], fields[19]
+        no_speech_probs = list(struct.unpack_from(f"<{n_probs}d", data, offset))
+        offset += 8 * n_probs
+        reasons = [
+            _decode_reason(*_REASON.unpack_from(data, offset + i * _REASON.size))
+            for i in range(n_reasons)
+        ]
+        offset += _REASON.size * n_reasons
+        strings = []
+        for length in fields[20:]:
+            strings.append(bytes(data[offset : offset + length]).decode())
+            offset += length
+        cut_from_sec, cut_to_sec = fields[6], fields[7]
+        return cls(
+            STATUSES[fields[1]],
+            error=strings[4],
+            window_start_sec=fields[4],
+            window_end_sec=fields[5],
+            cut_from_sec=None if math.isnan(cut_from_sec) else cut_from_sec,
+            cut_to_sec=None if math.isnan(cut_to_sec) else cut_to_sec,
+            merged=strings[0],
+            delta=strings[1],
+            last_valid=strings[2],
+            prompt=strings[3],
+            vad_ran=bool(fields[2] & FLAG_VAD_RAN),
+            no_speech_probs=no_speech_probs,
+            asr_duration_sec=fields[8],
+            audio_duration_sec=fields[9],
+            filter_duration_sec=fields[10],
+            tail_duration_sec=fields[11],
+            extra_metrics=json.loads(strings[5]) if strings[5] else None,
+            cache_samples=fields[12],
+            capacity_samples=fields[13],
+            copied_bytes=fields[14],
+            total_copied_bytes=fields[15],
+            active_samples=fields[16],
+            tail_samples=fields[17],
+            reasons=reasons,
+            same_merged_count=fields[3],
+            is_speech=bool(fields[2] & FLAG_IS_SPEECH),
+        )
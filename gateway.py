@@ -0,0 +1,554 @@
+import argparse
+import asyncio
+import functools
+import json
+import socket
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable
+
+from loguru import logger
+from websockets.asyncio.server import Server, ServerConnection, serve
+from websockets.exceptions import ConnectionClosed
+from websockets.http11 import Request, Response
+
+from asr_emitter import Emission, ResultEmitter
+from asr_engine import ASREngine
+from asr_metrics import ASRMetrics, MetricsServer
+from asr_result import STATUS_ERROR, ASRResult
+from runtime import ASREngineFactory, InferenceRuntime
+from utils.resample import StreamingResampler
+
+
+STATE_INIT = "INIT"
+STATE_READY = "READY"
+STATE_STREAMING = "STREAMING"
+STATE_FINISHING = "FINISHING"
+STATE_CLOSED = "CLOSED"
+
+ERROR_BAD_JSON = 4001
+ERROR_BAD_CONFIG = 4002
+ERROR_NO_HELLO = 4005
+ERROR_FRAME_SIZE = 4006
+ERROR_DATA_TIMEOUT = 4008
+ERROR_TOO_MANY = 4029
+ERROR_ENGINE = 5000
+ERROR_STREAM = 5003
+
+SUPPORTED_CODECS = {"pcm"}
+# full：result.data.text 为整句文本；delta：只携带变化后缀，并用 data.offset 标明替换起点
+RESULT_MODES = {"full", "delta"}
+# 非 sample_rate 单声道的输入由网关重采样、下混后再送入引擎
+SUPPORTED_SAMPLE_RATES = {8000, 16000, 22050, 24000, 32000, 44100, 48000}
+MAX_CHANNELS = 2
+BYTES_PER_SAMPLE = 2
+
+
+class ProtocolError(Exception):
+    def __init__(self, code: int, message: str) -> None:
+        super().__init__(message)
+        self.code = code
+        self.message = message
+
+
+class StreamSession:
+    def __init__(self, websocket: ServerConnection) -> None:
+        self.websocket = websocket
+        self.session_id = f"sess-{uuid.uuid4()}"
+        self.trace_id = ""
+        self.state = STATE_INIT
+        self.sample_rate = 0
+        self.channels = 0
+        self.frame_duration_ms = 0
+        self.frame_bytes = 0
+        self.resampler: StreamingResampler | None = None
+        self.frame_count = 0
+        self.seq_no = 0
+        self.engine: ASREngine | None = None
+        self.runtime_open = False
+        self.runtime_closed: asyncio.Event | None = None
+        self.pending = bytearray()
+        self.chunk_bytes = 0
+        self.emitter = ResultEmitter()
+        self.emit_task: asyncio.Task | None = None
+        self.finish_task: asyncio.Task | None = None
+        # 攒满但尚未交给引擎的 PCM 及其对应的 tick 数；每个会话最多一个处理任务（tick_task），
+        # 推理跟不上时积压的 tick 在下一次处理时合并，只识别一次 [start_idx, 最新 end_idx)
+        self.queued = bytearray()
+        self.queued_ticks = 0
+        self.tick_task: asyncio.Task | None = None
+        self.engine_lock = asyncio.Lock()
+        now = time.monotonic()
+        self.last_frame_time = now
+        self.last_ping_time = now
+
+
+class Gateway:
+    def __init__(
+        self,
+        engine_factory: Callable[[], ASREngine] | None = None,
+        *,
+        runtime: InferenceRuntime | None = None,
+        sample_rate: int = 16000,
+        max_sessions: int = 10000,
+        inference_workers: int = 1,
+        authenticate: Callable[[str], bool] | None = None,
+        watchdog_interval_sec: float = 1.0,
+        partial_interval_sec: float = 0.5,
+        metrics: ASRMetrics | None = None,
+    ) -> None:
+        if engine_factory is None and runtime is None:
+            raise ValueError("engine_factory or runtime is required")
+        self.engine_factory = engine_factory
+        self.runtime = runtime
+        self.sample_rate = sample_rate
+        self.max_sessions = max_sessions
+        self.authenticate = authenticate
+        self.watchdog_interval_sec = watchdog_interval_sec
+        self.partial_interval_sec = partial_interval_sec
+        self.metrics = metrics
+        self.executor = ThreadPoolExecutor(
+            max_workers=inference_workers, thread_name_prefix="asr-worker"
+        )
+        self.sessions: dict[str, StreamSession] = {}
+        self.watchdog_task: asyncio.Task | None = None
+        self.dispatch_task: asyncio.Task | None = None
+
+    async def serve(self, host: str = "0.0.0.0", port: int = 8765) -> Server:
+        server = await serve(
+            self.handle,
+            host,
+            port,
+            process_request=self.process_request,
+            ping_interval=None,
+            max_size=1 << 20,
+            max_queue=64,
+            compression=None,
+        )
+        loop = asyncio.get_running_loop()
+        self.watchdog_task = loop.create_task(self.watchdog())
+        if self.runtime is not None:
+            self.dispatch_task = loop.create_task(self.dispatch_results())
+        return server
+
+    def process_request(self, connection: ServerConnection, request: Request) -> Response | None:
+        if self.authenticate is not None:
+            authorization = request.headers.get("Authorization", "")
+            token = authorization[len("Bearer ") :] if authorization.startswith("Bearer ") else ""
+            if not token or not self.authenticate(token):
+                return connection.respond(401, "Unauthorized\n")
+        return None
+
+    async def handle(self, websocket: ServerConnection) -> None:
+        sock = websocket.transport.get_extra_info("socket")
+        if sock is not None:
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+        session = StreamSession(websocket)
+        if len(self.sessions) >= self.max_sessions:
+            await self.send_error(session, ERROR_TOO_MANY, "too many sessions")
+            return
+        self.sessions[session.session_id] = session
+        if self.metrics is not None:
+            self.metrics.open_session(session.session_id)
+        try:
+            async for message in websocket:
+                if isinstance(message, bytes):
+                    await self.on_audio(session, message)
+                else:
+                    await self.on_text(session, message)
+                if session.state == STATE_CLOSED:
+                    break
+        except ProtocolError as exc:
+            await self.send_error(session, exc.code, exc.message)
+        except ConnectionClosed:
+            pass
+        except Exception as exc:
+            logger.exception(f"[{session.session_id}] gateway failure: {exc}")
+            await self.send_error(session, ERROR_STREAM, str(exc))
+        finally:
+            if session.finish_task is not None and not session.finish_task.done():
+                # 收尾任务会自行结束（连接已断开时发送失败被忽略），等它完成关闭握手；被 cancel 时已取消
+                await asyncio.wait([session.finish_task])
+            session.state = STATE_CLOSED
+            for task in (session.emit_task, session.tick_task):
+                if task is not None:
+                    task.cancel()
+            self.sessions.pop(session.session_id, None)
+            if self.metrics is not None:
+                self.metrics.close_session(session.session_id)
+            if session.runtime_open:
+                session.runtime_open = False
+                self.runtime.close_session(session.session_id)
+
+    async def on_text(self, session: StreamSession, message: str) -> None:
+        try:
+            payload = json.loads(message)
+            msg_type = payload["type"]
+        except (ValueError, KeyError, TypeError):
+            raise ProtocolError(ERROR_BAD_JSON, "invalid JSON message")
+
+        if msg_type == "ping":
+            session.last_ping_time = time.monotonic()
+            await self.send(session, {"type": "pong", "timestamp_ms": payload.get("timestamp_ms")})
+            return
+
+        if session.state == STATE_INIT:
+            if msg_type != "hello":
+                raise ProtocolError(ERROR_BAD_JSON, "hello is required before any other message")
+            self.on_hello(session, payload)
+            session.state = STATE_READY
+            await self.send(
+                session,
+                {
+                    "type": "ack",
+                    "session_id": session.session_id,
+                    "trace_id": session.trace_id,
+                    "status": "ok",
+                },
+            )
+            return
+
+        if msg_type != "control":
+            raise ProtocolError(ERROR_BAD_JSON, f"unexpected message type: {msg_type}")
+        action = payload.get("action")
+        if action == "cancel":
+            session.state = STATE_CLOSED
+            if session.finish_task is not None:
+                session.finish_task.cancel()
+            await session.websocket.close(1000, "cancelled")
+        elif action == "finish" and session.state in (STATE_READY, STATE_STREAMING):
+            session.state = STATE_FINISHING
+            # 在独立任务中收尾，接收循环继续读取消息，FINISHING 期间的 cancel 可以立即生效
+            session.finish_task = asyncio.get_running_loop().create_task(self.run_finish(session))
+        elif session.state != STATE_FINISHING:
+            raise ProtocolError(ERROR_BAD_JSON, f"unsupported control action: {action}")
+
+    def on_hello(self, session: StreamSession, payload: dict[str, Any]) -> None:
+        try:
+            config = payload["config"]
+            codec = config["codec"]
+            sample_rate = int(config["sample_rate"])
+            channels = int(config["channels"])
+            frame_duration_ms = int(config["frame_duration_ms"])
+            result_mode = config.get("result_mode", "full")
+        except (AttributeError, KeyError, TypeError, ValueError):
+            raise ProtocolError(ERROR_BAD_JSON, "hello.config is missing required fields")
+
+        if codec not in SUPPORTED_CODECS:
+            raise ProtocolError(ERROR_BAD_CONFIG, f"unsupported codec: {codec}")
+        if sample_rate not in SUPPORTED_SAMPLE_RATES or not 1 <= channels <= MAX_CHANNELS:
+            raise ProtocolError(
+                ERROR_BAD_CONFIG, f"unsupported audio format: {sample_rate}Hz x{channels}"
+            )
+        if frame_duration_ms <= 0 or sample_rate * frame_duration_ms % 1000 != 0:
+            raise ProtocolError(ERROR_BAD_CONFIG, f"unsupported frame duration: {frame_duration_ms}ms")
+        if result_mode not in RESULT_MODES:
+            raise ProtocolError(ERROR_BAD_CONFIG, f"unsupported result mode: {result_mode}")
+
+        session.trace_id = str(payload.get("trace_id", ""))
+        session.sample_rate = sample_rate
+        session.channels = channels
+        session.frame_duration_ms = frame_duration_ms
+        session.emitter = ResultEmitter(
+            min_partial_interval_sec=self.partial_interval_sec, delta=result_mode == "delta"
+        )
+        # PayloadBytes = SampleRate * (BitDepth / 8) * Channels * T_frame
+        session.frame_bytes = sample_rate * BYTES_PER_SAMPLE * channels * frame_duration_ms // 1000
+        if sample_rate != self.sample_rate or channels != 1:
+            session.resampler = StreamingResampler(sample_rate, self.sample_rate, channels)
+
+    async def on_audio(self, session: StreamSession, frame: bytes) -> None:
+        if session.state == STATE_INIT:
+            raise ProtocolError(ERROR_NO_HELLO, "audio received before hello")
+        if session.state == STATE_FINISHING:
+            return
+        if len(frame) != session.frame_bytes:
+            raise ProtocolError(
+                ERROR_FRAME_SIZE,
+                f"PCM frame is {len(frame)} bytes, expected {session.frame_bytes}",
+            )
+
+        now = time.monotonic()
+        gap_ms = (now - session.last_frame_time) * 1000
+        if session.state == STATE_STREAMING and gap_ms > 3 * session.frame_duration_ms:
+            logger.warning(f"[{session.session_id}] network jitter: {gap_ms:.0f}ms without audio")
+        session.last_frame_time = now
+
+        if session.state == STATE_READY:
+            session.state = STATE_STREAMING
+            if self.runtime is not None:
+                self.runtime.open_session(session.session_id)
+                session.runtime_open = True
+            else:
+                session.engine = self.engine_factory()
+                session.engine.frame_duration_ms = session.frame_duration_ms
+                # 按协商格式的整帧攒够 min_process_sec
+                frame_samples = self.sample_rate * session.frame_duration_ms // 1000
+                frames = -(-session.engine.one_second_samples // frame_samples)
+                session.chunk_bytes = frames * session.frame_bytes
+
+        session.frame_count += 1
+        if session.runtime_open:
+            # PCM 只写入一次共享内存环，攒够 min_process_sec 后由 runtime 向 Worker 发送描述符
+            if session.resampler is not None:
+                self.runtime.write(session.session_id, session.resampler.process_pcm16(frame))
+            else:
+                self.runtime.write_pcm16(session.session_id, frame)
+            return
+        session.pending += frame
+        if len(session.pending) >= session.chunk_bytes:
+            # 攒满的 PCM 整块排队，由 push_pcm16 直接缩放写入环形缓冲区；已有处理任务时只合并，不再新建
+            session.queued += session.pending
+            session.pending = bytearray()
+            session.queued_ticks += 1
+            if session.tick_task is None:
+                session.tick_task = asyncio.get_running_loop().create_task(self.process_ticks(session))
+                session.tick_task.add_done_callback(functools.partial(self.on_tick_done, session))
+
+    @staticmethod
+    def on_tick_done(session: StreamSession, task: asyncio.Task) -> None:
+        if not task.cancelled() and task.exception() is not None:
+            logger.opt(exception=task.exception()).error(
+                f"[{session.session_id}] chunk processing failed"
+            )
+
+    async def process_ticks(self, session: StreamSession) -> None:
+        try:
+            async with session.engine_lock:
+                while session.queued and session.state != STATE_CLOSED:
+                    await self.process_queued(session)
+        finally:
+            # 检查 queued 与清空 tick_task 之间没有 await，on_audio 不会错过新建任务的时机
+            session.tick_task = None
+
+    async def process_queued(self, session: StreamSession, flush: bool = False) -> None:
+        """
+        把排队的 PCM 一次交给引擎并只识别一次；调用方持有 engine_lock。
+        合并掉的 tick 数与 multiprocess 模式的 Worker 一样记入 metrics.skipped_ticks。
+        """
+        pcm, session.queued = session.queued, bytearray()
+        skipped = max(session.queued_ticks - 1, 0)
+        session.queued_ticks = 0
+        loop = asyncio.get_running_loop()
+        result = await loop.run_in_executor(
+            self.executor, functools.partial(self.push_pcm, session, pcm, flush)
+        )
+        if result is not None:
+            result.set_metric("skipped_ticks", skipped)
+            await self.on_result(session, result)
+
+    @staticmethod
+    def push_pcm(session: StreamSession, pcm: bytearray, flush: bool) -> ASRResult | None:
+        if session.resampler is None:
+            return session.engine.push_pcm16(pcm, flush=flush)
+        # 重采样器的状态跨批次保留，由 engine_lock 保证按到达顺序处理
+        return session.engine.push_chunk(session.resampler.process_pcm16(pcm, final=flush))
+
+    async def on_result(self, session: StreamSession, result: ASRResult) -> None:
+        if self.metrics is not None:
+            self.metrics.observe(session.session_id, result)
+        if result.status == STATUS_ERROR:
+            logger.error(f"[{session.session_id}] engine error: {result.error}")
+            await self.send_error(session, ERROR_ENGINE, "engine internal error")
+            session.state = STATE_CLOSED
+            return
+
+        emission = session.emitter.push(result, time.monotonic())
+        if emission is not None:
+            await self.send_result(session, emission)
+        elif session.emit_task is None:
+            delay = session.emitter.next_due(time.monotonic())
+            if delay is not None:
+                # 间隔内被压下的 partial 到期后补发，即使之后没有新结果
+                session.emit_task = asyncio.get_running_loop().create_task(
+                    self.emit_pending(session, delay)
+                )
+
+    async def emit_pending(self, session: StreamSession, delay: float) -> None:
+        await asyncio.sleep(delay)
+        session.emit_task = None
+        if session.state == STATE_CLOSED:
+            return
+        emission = session.emitter.poll(time.monotonic())
+        if emission is not None:
+            await self.send_result(session, emission)
+
+    async def send_result(self, session: StreamSession, emission: Emission) -> None:
+        session.seq_no += 1
+        await self.send_raw(
+            session,
+            emission.to_protocol_json(
+                session.session_id, session.seq_no, self.timestamp_ms(session, emission.result)
+            ),
+        )
+
+    @staticmethod
+    def timestamp_ms(session: StreamSession, result: ASRResult) -> tuple[int, int]:
+        # 协议第 8 节：时间戳 = FrameCount * T_frame。引擎的采样点索引在重采样时带有滤波器延迟和
+        # 不足一帧的输出，因此换算成帧数后取整到帧边界，并以已收到的帧数为上限
+        frame_ms = session.frame_duration_ms
+        start_frame = min(round(result.window_start_sec * 1000 / frame_ms), session.frame_count)
+        end_frame = min(round(result.window_end_sec * 1000 / frame_ms), session.frame_count)
+        return start_frame * frame_ms, end_frame * frame_ms
+
+    async def dispatch_results(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            item = await loop.run_in_executor(None, self.runtime.get_result, 0.5)
+            if item is None:
+                continue
+            session_id, result = item
+            session = self.sessions.get(session_id)
+            if session is None:
+                continue
+            if result is None:
+                if session.runtime_closed is not None:
+                    session.runtime_closed.set()
+            elif session.state != STATE_CLOSED:
+                await self.on_result(session, result)
+
+    async def run_finish(self, session: StreamSession) -> None:
+        try:
+            await self.finish(session)
+        except ConnectionClosed:
+            session.state = STATE_CLOSED
+        except Exception as exc:
+            logger.exception(f"[{session.session_id}] finish failure: {exc}")
+            await self.send_error(session, ERROR_STREAM, str(exc))
+
+    async def finish(self, session: StreamSession) -> None:
+        if session.runtime_open:
+            # Worker 按顺序处理描述符，收到关闭确认时此前的结果都已下发
+            session.runtime_open = False
+            if session.resampler is not None:
+                self.runtime.write(session.session_id, session.resampler.process_pcm16(b"", final=True))
+            session.runtime_closed = asyncio.Event()
+            self.runtime.close_session(session.session_id)
+            await session.runtime_closed.wait()
+        elif session.engine is not None:
+            async with session.engine_lock:
+                session.queued += session.pending
+                session.pending = bytearray()
+                if session.queued and session.state != STATE_CLOSED:
+                    await self.process_queued(session, flush=True)
+        if session.state == STATE_CLOSED:
+            return
+        emission = session.emitter.finish()
+        if emission is not None:
+            await self.send_result(session, emission)
+        await self.send(session, {"type": "bye", "session_id": session.session_id})
+        session.state = STATE_CLOSED
+        await session.websocket.close(1000, "finished")
+
+    async def send(self, session: StreamSession, payload: dict[str, Any]) -> None:
+        await self.send_raw(session, json.dumps(payload, ensure_ascii=False))
+
+    async def send_raw(self, session: StreamSession, message: str) -> None:
+        try:
+            await session.websocket.send(message)
+        except ConnectionClosed:
+            session.state = STATE_CLOSED
+
+    async def send_error(self, session: StreamSession, code: int, message: str) -> None:
+        await self.send(
+            session,
+            {
+                "type": "error",
+                "code": code,
+                "message": message,
+                "trace_id": session.trace_id,
+                "timestamp_ms": int(time.time() * 1000),
+            },
+        )
+        session.state = STATE_CLOSED
+        # 5xxx 不是合法的 WebSocket 关闭码，服务端异常统一以 1011 关闭
+        await session.websocket.close(code if code < 5000 else 1011, message[:120])
+
+    async def watchdog(self) -> None:
+        while True:
+            await asyncio.sleep(self.watchdog_interval_sec)
+            now = time.monotonic()
+            for session in list(self.sessions.values()):
+                frame_sec = (session.frame_duration_ms or 20) / 1000
+                if now - session.last_ping_time > 1500 * frame_sec:
+                    logger.warning(f"[{session.session_id}] heartbeat timeout, dropping connection")
+                    session.state = STATE_CLOSED
+                    session.websocket.transport.abort()
+                elif (
+                    session.state == STATE_STREAMING
+                    and now - session.last_frame_time > 500 * frame_sec
+                ):
+                    await self.send_error(session, ERROR_DATA_TIMEOUT, "audio stream timeout")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Realtime ASR WebSocket gateway (protocol v1.0.0).")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--asr-model", default="local_models/faster-whisper-large-v3-turbo-ct2")
+    parser.add_argument("--vad-model", default="local_models/faster-whisper-tiny")
+    parser.add_argument("--device", default="cuda")
+    parser.add_argument("--max-sessions", type=int, default=10000)
+    parser.add_argument("--inference-workers", type=int, default=1)
+    parser.add_argument(
+        "--multiprocess",
+        action="store_true",
+        help="run inference in a separate process fed through shared-memory audio rings",
+    )
+    parser.add_argument(
+        "--partial-interval",
+        type=float,
+        default=0.5,
+        help="minimum seconds between two partial results sent to one client",
+    )
+    parser.add_argument(
+        "--metrics-port",
+        type=int,
+        default=None,
+        help="serve Prometheus metrics on http://HOST:PORT/metrics "
+        "(per-stage latencies are only reported without --multiprocess)",
+    )
+    args = parser.parse_args()
+
+    from faster_whisper import WhisperModel
+
+    from utils.logging import setup_logger
+
+    setup_logger(level="INFO")
+    metrics = None
+    if args.metrics_port is not None:
+        metrics = ASRMetrics()
+        MetricsServer(metrics, args.host, args.metrics_port).start()
+        logger.info(f"metrics listening on http://{args.host}:{args.metrics_port}/metrics")
+    if args.multiprocess:
+        runtime = InferenceRuntime(ASREngineFactory(args.asr_model, args.vad_model, args.device))
+        runtime.start()
+        gateway = Gateway(
+            runtime=runtime,
+            max_sessions=args.max_sessions,
+            partial_interval_sec=args.partial_interval,
+            metrics=metrics,
+        )
+    else:
+        asr_model = WhisperModel(args.asr_model, device=args.device)
+        vad_model = WhisperModel(args.vad_model, device=args.device)
+        gateway = Gateway(
+            lambda: ASREngine(asr_model, vad_model),
+            max_sessions=args.max_sessions,
+            inference_workers=args.inference_workers,
+            partial_interval_sec=args.partial_interval,
+            metrics=metrics,
+        )
+
+    async def run() -> None:
+        server = await gateway.serve(args.host, args.port)
+        logger.info(f"gateway listening on ws://{args.host}:{args.port}")
+        await server.serve_forever()
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
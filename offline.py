@@ -0,0 +1,266 @@
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable
+
+import numpy as np
+import soundfile as sf
+from faster_whisper import WhisperModel
+
+from utils.chrono import format_hms
+from utils.string import AhoCorasick
+from vad_engine import SileroVAD
+
+
+def speech_regions(
+    probs: np.ndarray,
+    frame_samples: int,
+    total_samples: int,
+    *,
+    threshold: float = 0.5,
+    min_silence_samples: int = 8000,
+    speech_pad_samples: int = 4800,
+) -> list[tuple[int, int]]:
+    # 与 silero-vad 的 get_speech_timestamps 相同的迟滞判定：高于 threshold 进入语音，
+    # 低于 threshold - 0.15 且持续 min_silence_samples 才结束
+    neg_threshold = max(threshold - 0.15, 0.01)
+    regions: list[tuple[int, int]] = []
+    start = None
+    silence_start = None
+    for i, prob in enumerate(probs):
+        if prob >= threshold:
+            silence_start = None
+            if start is None:
+                start = i * frame_samples
+        elif start is not None and prob < neg_threshold:
+            if silence_start is None:
+                silence_start = i * frame_samples
+            if (i + 1) * frame_samples - silence_start >= min_silence_samples:
+                regions.append((start, silence_start))
+                start = None
+                silence_start = None
+    if start is not None:
+        regions.append((start, total_samples))
+
+    padded: list[tuple[int, int]] = []
+    for start, end in regions:
+        start = max(0, start - speech_pad_samples)
+        end = min(total_samples, end + speech_pad_samples)
+        if padded and start <= padded[-1][1]:
+            padded[-1] = (padded[-1][0], end)
+        else:
+            padded.append((start, end))
+    return padded
+
+
+def plan_chunks(
+    regions: list[tuple[int, int]],
+    probs: np.ndarray,
+    frame_samples: int,
+    max_chunk_samples: int,
+) -> list[tuple[int, int]]:
+    chunks: list[tuple[int, int]] = []
+    for start, end in regions:
+        # 超长语音段在后半段概率最低的帧处切开
+        while end - start > max_chunk_samples:
+            lo = (start + max_chunk_samples // 2) // frame_samples
+            hi = (start + max_chunk_samples) // frame_samples
+            if hi > lo:
+                cut = (lo + int(np.argmin(probs[lo:hi]))) * frame_samples
+            else:
+                cut = start + max_chunk_samples
+            chunks.append((start, cut))
+            start = cut
+        # 相邻语音段能放进同一块时合并，减少调用次数
+        if chunks and end - chunks[-1][0] <= max_chunk_samples:
+            chunks[-1] = (chunks[-1][0], end)
+        else:
+            chunks.append((start, end))
+    return chunks
+
+
+def transcribe_offline(
+    audio: np.ndarray,
+    asr_model: WhisperModel,
+    *,
+    sample_rate: int = 16000,
+    vad: SileroVAD | None = None,
+    max_chunk_sec: float = 30.0,
+    workers: int = 4,
+    language: str = "ja",
+    hallucination_blacklist: list[str] | None = None,
+) -> dict[str, Any]:
+    start_time = time.time()
+    audio = np.asarray(audio, dtype=np.float32).reshape(-1)
+    vad = vad or SileroVAD(sample_rate=sample_rate)
+    probs = vad.speech_probs(audio)
+    return transcribe_chunks(
+        lambda start, end: audio[start:end],
+        len(audio),
+        probs,
+        vad.frame_samples,
+        asr_model,
+        start_time=start_time,
+        sample_rate=sample_rate,
+        max_chunk_sec=max_chunk_sec,
+        workers=workers,
+        language=language,
+        hallucination_blacklist=hallucination_blacklist,
+    )
+
+
+def transcribe_file(
+    path: str,
+    asr_model: WhisperModel,
+    *,
+    vad: SileroVAD | None = None,
+    block_sec: float = 30.0,
+    max_chunk_sec: float = 30.0,
+    workers: int = 4,
+    language: str = "ja",
+    hallucination_blacklist: list[str] | None = None,
+) -> dict[str, Any]:
+    """
+    与 transcribe_offline() 相同，但不把整个文件读入内存：VAD 按 block_sec 的块顺序读取，
+    每个识别块在工作线程中单独从文件读取，常驻音频最多 workers 个块。多声道取平均。
+    """
+    start_time = time.time()
+    with sf.SoundFile(path) as f:
+        sample_rate = f.samplerate
+        total_samples = f.frames
+        if sample_rate != 16000:
+            raise ValueError(f"expected 16000 Hz audio, got {sample_rate} Hz")
+        vad = vad or SileroVAD(sample_rate=sample_rate)
+        blocks = f.blocks(blocksize=int(block_sec * sample_rate), dtype="float32", always_2d=True)
+        probs = vad.speech_probs_blocks(block.mean(axis=1) for block in blocks)
+
+    def read(start: int, end: int) -> np.ndarray:
+        # 每次单独打开文件，工作线程之间不共享文件位置
+        audio, _ = sf.read(path, start=start, stop=end, dtype="float32", always_2d=True)
+        return audio.mean(axis=1)
+
+    return transcribe_chunks(
+        read,
+        total_samples,
+        probs,
+        vad.frame_samples,
+        asr_model,
+        start_time=start_time,
+        sample_rate=sample_rate,
+        max_chunk_sec=max_chunk_sec,
+        workers=workers,
+        language=language,
+        hallucination_blacklist=hallucination_blacklist,
+    )
+
+
+def transcribe_chunks(
+    read: Callable[[int, int], np.ndarray],
+    total_samples: int,
+    probs: np.ndarray,
+    frame_samples: int,
+    asr_model: WhisperModel,
+    *,
+    start_time: float,
+    sample_rate: int = 16000,
+    max_chunk_sec: float = 30.0,
+    workers: int = 4,
+    language: str = "ja",
+    hallucination_blacklist: list[str] | None = None,
+) -> dict[str, Any]:
+    """
+    按 VAD 概率切块并并行识别；read(start, end) 返回 [start, end) 的单声道 float32 音频。
+    """
+    regions = speech_regions(probs, frame_samples, total_samples)
+    chunks = plan_chunks(regions, probs, frame_samples, int(max_chunk_sec * sample_rate))
+    vad_duration_sec = time.time() - start_time
+
+    def transcribe_chunk(chunk: tuple[int, int]) -> list[Any]:
+        segments, _ = asr_model.transcribe(
+            read(chunk[0], chunk[1]),
+            language=language,
+            condition_on_previous_text=False,
+        )
+        return list(segments)
+
+    hallucination_filter = AhoCorasick(hallucination_blacklist or [])
+    results: list[dict[str, Any]] = []
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="offline-asr") as executor:
+        # map 按提交顺序返回，拼接时无需再排序
+        for (chunk_start, _), segments in zip(chunks, executor.map(transcribe_chunk, chunks)):
+            offset_sec = chunk_start / sample_rate
+            for segment in segments:
+                text = segment.text.strip()
+                if hallucination_filter:
+                    text, _ = hallucination_filter.remove(text)
+                if not text:
+                    continue
+                results.append(
+                    {
+                        "start_sec": offset_sec + segment.start,
+                        "end_sec": offset_sec + segment.end,
+                        "text": text,
+                    }
+                )
+
+    processing_sec = time.time() - start_time
+    audio_duration_sec = total_samples / sample_rate
+    speech_sec = sum(end - start for start, end in chunks) / sample_rate
+    return {
+        "segments": results,
+        "text": "".join(segment["text"] for segment in results),
+        "metrics": {
+            "audio_duration_sec": audio_duration_sec,
+            "speech_duration_sec": speech_sec,
+            "chunks": len(chunks),
+            "vad_duration_sec": vad_duration_sec,
+            "processing_sec": processing_sec,
+            "rtf": processing_sec / audio_duration_sec if audio_duration_sec > 0 else 0.0,
+        },
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Offline long-file transcription.")
+    parser.add_argument("input", help="16 kHz WAV/FLAC file")
+    parser.add_argument("--output", help="write the transcript here instead of stdout")
+    parser.add_argument("--asr-model", default="local_models/faster-whisper-large-v3-turbo-ct2")
+    parser.add_argument("--device", default="cuda")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--max-chunk-sec", type=float, default=30.0)
+    parser.add_argument("--language", default="ja")
+    args = parser.parse_args()
+
+    sample_rate = sf.info(args.input).samplerate
+    if sample_rate != 16000:
+        parser.error(f"expected 16000 Hz audio, got {sample_rate} Hz")
+    asr_model = WhisperModel(args.asr_model, device=args.device, num_workers=args.workers)
+    result = transcribe_file(
+        args.input,
+        asr_model,
+        max_chunk_sec=args.max_chunk_sec,
+        workers=args.workers,
+        language=args.language,
+    )
+
+    lines = [
+        f"[{format_hms(segment['start_sec'])} -> {format_hms(segment['end_sec'])}] {segment['text']}"
+        for segment in result["segments"]
+    ]
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+    else:
+        print("\n".join(lines))
+
+    metrics = result["metrics"]
+    print(
+        f"音频时长: {format_hms(metrics['audio_duration_sec'])}  "
+        f"分块: {metrics['chunks']}  "
+        f"耗时: {metrics['processing_sec']:.2f}s  "
+        f"RTF: {metrics['rtf']:.4f}"
+    )
+
+
+if __name__ == "__main__":
+    main()
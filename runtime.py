@@ -0,0 +1,311 @@
+import multiprocessing as mp
+import queue
+import uuid
+from multiprocessing import shared_memory
+from typing import Any, Callable
+
+import numpy as np
+from loguru import logger
+
+from asr_engine import ASREngine
+from asr_result import STATUS_ERROR, ASRResult
+from utils.last_value_queue import LastValueQueue
+from utils.ring_buffer import AudioRingBuffer
+
+
+HEADER_END = 0
+HEADER_START = 1
+# Worker 正在识别的窗口起点，空闲时为 -1；网关不会覆盖该位置之后的数据
+HEADER_PINNED = 2
+# 网关因窗口被占用而丢弃的新音频累计采样点数
+HEADER_DROPPED = 3
+HEADER_SLOTS = 4
+HEADER_BYTES = HEADER_SLOTS * 8
+
+
+class SharedAudioRing(AudioRingBuffer):
+    """
+    存放在 multiprocessing.shared_memory 中的 float32 音频环形缓冲区。
+    网关进程调用 write() 追加音频并发布 end_idx；Worker 进程用 advance() 接收描述符中的 end_idx，
+    通过 window() 原地读取窗口，release() 发布已消费位置，网关据此判断可覆盖的空间。
+    Worker 识别期间用 pin() 发布窗口起点：网关写满到该位置时丢弃新音频并计数，而不是覆盖正在识别的窗口；
+    Worker 空闲时网关仍按环形缓冲区覆盖最旧的数据，由 advance() 报告。
+    """
+
+    reanchor = False
+
+    def __init__(self, name: str | None, capacity: int, create: bool = False) -> None:
+        size = HEADER_BYTES + capacity * np.dtype(np.float32).itemsize
+        self.shm = shared_memory.SharedMemory(name=name, create=create, size=size if create else 0)
+        self.name = self.shm.name
+        self.owner = create
+        self.header = np.ndarray((HEADER_SLOTS,), dtype=np.int64, buffer=self.shm.buf)
+        if create:
+            self.header[:] = 0
+            self.header[HEADER_PINNED] = -1
+        # Worker 侧已报告过的 HEADER_DROPPED
+        self.seen_dropped = 0
+        data = np.ndarray((capacity,), dtype=np.float32, buffer=self.shm.buf, offset=HEADER_BYTES)
+        super().__init__(capacity, np.float32, buffer=data)
+
+    def reset(self) -> None:
+        end_idx = getattr(self, "end_idx", 0)
+        self.start_idx = end_idx
+        self.end_idx = end_idx
+        self.origin_idx = 0
+        self.header[HEADER_START] = end_idx
+
+    def _write(self, chunk: np.ndarray, scale: np.float32 | None) -> int:
+        self.start_idx = max(self.start_idx, int(self.header[HEADER_START]))
+        pinned_idx = int(self.header[HEADER_PINNED])
+        rejected = 0
+        if pinned_idx >= 0:
+            room = max(0, pinned_idx + self.capacity - self.end_idx)
+            if len(chunk) > room:
+                rejected = len(chunk) - room
+                chunk = chunk[:room]
+                self.header[HEADER_DROPPED] += rejected
+        dropped = super()._write(chunk, scale)
+        self.header[HEADER_END] = self.end_idx
+        return dropped + rejected
+
+    def advance(self, end_idx: int) -> int:
+        """
+        Worker 侧：把可见数据推进到 end_idx，返回因网关超前超过容量而被覆盖、
+        以及因窗口被占用而被网关丢弃的采样点数。
+        """
+        self.end_idx = max(self.end_idx, end_idx)
+        floor_idx = self.end_idx - self.capacity
+        dropped = max(0, floor_idx - self.start_idx)
+        if dropped:
+            self.release(floor_idx)
+        rejected = int(self.header[HEADER_DROPPED])
+        dropped += rejected - self.seen_dropped
+        self.seen_dropped = rejected
+        return dropped
+
+    def pin(self) -> int:
+        """
+        Worker 侧：识别开始前发布窗口起点，返回该起点。
+        """
+        self.header[HEADER_PINNED] = self.start_idx
+        return self.start_idx
+
+    def unpin(self, pinned_idx: int) -> bool:
+        """
+        Worker 侧：识别结束后撤销发布；返回窗口是否完好。
+        网关可能在看到 pin 之前已开始一次写入，因此再按已发布的写入位置确认一次。
+        """
+        self.header[HEADER_PINNED] = -1
+        return int(self.header[HEADER_END]) - self.capacity <= pinned_idx
+
+    def release(self, idx: int) -> None:
+        super().release(idx)
+        self.header[HEADER_START] = self.start_idx
+
+    def close(self) -> None:
+        self.header = None
+        self.data = None
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+
+class ASREngineFactory:
+    """
+    可 pickle 的引擎工厂：模型在 Worker 进程内首次调用时加载，所有会话共享。
+    """
+
+    def __init__(
+        self,
+        asr_model_path: str,
+        vad_model_path: str | None = None,
+        device: str = "cuda",
+        **engine_kwargs: Any,
+    ) -> None:
+        self.asr_model_path = asr_model_path
+        self.vad_model_path = vad_model_path
+        self.device = device
+        # feature_cache 依赖 faster-whisper 内部接口，只在显式传入时启用
+        engine_kwargs.setdefault("feature_cache", False)
+        self.engine_kwargs = engine_kwargs
+        self.asr_model = None
+        self.vad_model = None
+
+    def __getstate__(self) -> dict[str, Any]:
+        state = self.__dict__.copy()
+        state["asr_model"] = None
+        state["vad_model"] = None
+        return state
+
+    def __call__(self, audio_cache: SharedAudioRing) -> ASREngine:
+        from faster_whisper import WhisperModel
+
+        if self.asr_model is None:
+            self.asr_model = WhisperModel(self.asr_model_path, device=self.device)
+            if self.vad_model_path:
+                self.vad_model = WhisperModel(self.vad_model_path, device=self.device)
+        return ASREngine(
+            self.asr_model,
+            self.vad_model,
+            device=self.device,
+            audio_cache=audio_cache,
+            **self.engine_kwargs,
+        )
+
+
+def worker_main(
+    input_queue: mp.Queue,
+    output_queue: mp.Queue,
+    engine_factory: Callable[[SharedAudioRing], Any],
+) -> None:
+    rings: dict[str, SharedAudioRing] = {}
+    engines: dict[str, Any] = {}
+    # session_id -> 最新的 end_idx；推理跟不上时同一会话积压的 tick 只保留最后一个
+    latest = LastValueQueue()
+
+    def run_window(session_id: str, end_idx: int, skipped: int) -> None:
+        ring = rings[session_id]
+        reasons = ["buffer_overflow"] if ring.advance(end_idx) > 0 else []
+        pinned_idx = ring.pin()
+        result = engines[session_id].process(reasons)
+        if not ring.unpin(pinned_idx):
+            # 识别期间窗口被覆盖（只在网关写入与 pin 竞争时发生），结果不可信，丢弃
+            logger.warning(f"[{session_id}] window overwritten during inference, result dropped")
+            return
+        result.set_metric("skipped_ticks", skipped)
+        # 结果以二进制编码跨进程传递，比 pickle 整个对象更小
+        output_queue.put((session_id, result.to_bytes()))
+
+    running = True
+    while running:
+        # 空闲时阻塞等待；有待处理窗口时只取已到达的消息，让推理期间堆积的 tick 合并
+        while True:
+            try:
+                message = input_queue.get_nowait() if latest else input_queue.get()
+            except queue.Empty:
+                break
+            kind, session_id = message[0], message[1]
+            if kind == "audio":
+                if session_id in engines:
+                    latest.put(session_id, message[3])
+                continue
+            # 控制消息之前先处理该会话尚未处理的窗口，保证关闭确认晚于它的所有结果
+            if session_id in latest:
+                run_window(*latest.pop(session_id))
+            if kind == "stop":
+                running = False
+                break
+            if kind == "open":
+                _, _, shm_name, capacity = message
+                ring = SharedAudioRing(shm_name, capacity)
+                rings[session_id] = ring
+                try:
+                    engines[session_id] = engine_factory(ring)
+                except Exception as exc:
+                    logger.exception(f"[{session_id}] failed to create engine: {exc}")
+                    output_queue.put((session_id, ASRResult(STATUS_ERROR, error=str(exc)).to_bytes()))
+            elif kind == "close":
+                engines.pop(session_id, None)
+                ring = rings.pop(session_id, None)
+                if ring is not None:
+                    ring.close()
+                output_queue.put((session_id, None))
+
+        if running and latest:
+            run_window(*latest.pop())
+
+    for ring in rings.values():
+        ring.close()
+
+
+class InferenceRuntime:
+    """
+    网关侧（进程 1）句柄：为每个会话创建共享内存音频环，PCM 只写入一次；
+    每累计 min_process_sec 的新音频，向 Worker（进程 2）发送一个小描述符 (kind, session_id, start_idx, end_idx)。
+    """
+
+    def __init__(
+        self,
+        engine_factory: Callable[[SharedAudioRing], Any],
+        *,
+        sample_rate: int = 16000,
+        min_process_sec: float = 1.0,
+        max_buffer_sec: float = 30.0,
+    ) -> None:
+        self.engine_factory = engine_factory
+        self.process_samples = int(sample_rate * min_process_sec)
+        self.capacity = int(sample_rate * max_buffer_sec)
+        context = mp.get_context("spawn")
+        self.input_queue = context.Queue()
+        self.output_queue = context.Queue()
+        self.worker = context.Process(
+            target=worker_main,
+            args=(self.input_queue, self.output_queue, engine_factory),
+            daemon=True,
+        )
+        self.rings: dict[str, SharedAudioRing] = {}
+        # session_id -> 上一个描述符的 end_idx
+        self.sent_idx: dict[str, int] = {}
+
+    def start(self) -> None:
+        self.worker.start()
+
+    def stop(self) -> None:
+        self.input_queue.put(("stop", ""))
+        self.worker.join()
+        self.sent_idx.clear()
+        for ring in self.rings.values():
+            ring.close()
+        self.rings.clear()
+
+    def open_session(self, session_id: str) -> None:
+        ring = SharedAudioRing(f"babylon_{uuid.uuid4().hex[:16]}", self.capacity, create=True)
+        self.rings[session_id] = ring
+        self.sent_idx[session_id] = 0
+        self.input_queue.put(("open", session_id, ring.name, self.capacity))
+
+    def write(self, session_id: str, chunk: np.ndarray) -> None:
+        ring = self.rings[session_id]
+        ring.write(chunk)
+        if ring.end_idx - self.sent_idx[session_id] >= self.process_samples:
+            self.flush(session_id)
+
+    def write_pcm16(self, session_id: str, pcm: bytes | bytearray | memoryview) -> None:
+        """
+        与 write() 相同，但直接接收 16-bit little-endian PCM，缩放后写入共享内存环。
+        """
+        ring = self.rings[session_id]
+        ring.write_pcm16(np.frombuffer(pcm, dtype="<i2"))
+        if ring.end_idx - self.sent_idx[session_id] >= self.process_samples:
+            self.flush(session_id)
+
+    def flush(self, session_id: str) -> None:
+        ring = self.rings.get(session_id)
+        start_idx = self.sent_idx.get(session_id)
+        if ring is not None and start_idx is not None and ring.end_idx > start_idx:
+            self.input_queue.put(("audio", session_id, start_idx, ring.end_idx))
+            self.sent_idx[session_id] = ring.end_idx
+
+    def close_session(self, session_id: str) -> None:
+        """
+        通知 Worker 关闭会话；共享内存在收到 Worker 的关闭确认后才释放，避免 Worker 尚未挂载就被 unlink。
+        """
+        self.flush(session_id)
+        self.sent_idx.pop(session_id, None)
+        self.input_queue.put(("close", session_id))
+
+    def get_result(self, timeout: float | None = None) -> tuple[str, ASRResult | None] | None:
+        """
+        返回 (session_id, result)；result 为 None 表示 Worker 已关闭该会话（此前的结果均已返回）。超时返回 None。
+        """
+        try:
+            session_id, result = self.output_queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+        if result is None:
+            ring = self.rings.pop(session_id, None)
+            if ring is not None:
+                ring.close()
+            return session_id, None
+        return session_id, ASRResult.from_bytes(result)
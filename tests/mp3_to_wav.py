@@ -1,14 +1,23 @@
 import argparse
+import os
+import sys
 from pathlib import Path
 
-import librosa
+import numpy as np
 import soundfile as sf
 
+sys.path.append(os.getcwd())
+from utils.resample import StreamingResampler
+
 
 def mp3_to_wav_16k_16bit_mono(input_path: str, output_path: str) -> None:
-    # librosa.load with mono=True will down-mix to mono and resample to target sr.
-    audio, _ = librosa.load(input_path, sr=16000, mono=True)
-    sf.write(output_path, audio, 16000, subtype="PCM_16")
+    # Decode, down-mix and resample block by block so memory use does not grow with the file.
+    info = sf.info(input_path)
+    resampler = StreamingResampler(info.samplerate, 16000, info.channels)
+    with sf.SoundFile(output_path, "w", 16000, 1, subtype="PCM_16") as output:
+        for block in sf.blocks(input_path, blocksize=info.samplerate, dtype="float32", always_2d=True):
+            output.write(resampler.process(block))
+        output.write(resampler.process(np.zeros((0, info.channels), dtype=np.float32), final=True))
 
 
 def main() -> None:
@@ -0,0 +1,52 @@
+import os
+import random
+import sys
+
+sys.path.append(os.getcwd())
+from utils.string import AhoCorasick
+
+
+def remove_naive(text, patterns):
+    # 逐个模式串 str.find，标记所有命中的字符后一起移除
+    mask = [False] * len(text)
+    hits = set()
+    for idx, pattern in enumerate(patterns):
+        pos = text.find(pattern)
+        while pos != -1:
+            hits.add(idx)
+            mask[pos : pos + len(pattern)] = [True] * len(pattern)
+            pos = text.find(pattern, pos + 1)
+    return "".join(ch for ch, masked in zip(text, mask) if not masked), hits
+
+
+# ----- 嵌套模式串：同一结束位置的短模式串也要报告 -----
+blacklist = ["ご視聴ありがとう", "ありがとう", "ご視聴"]
+ac = AhoCorasick(blacklist)
+matches = ac.find("ご視聴ありがとうございました")
+assert (0, 8, 0) in matches and (3, 8, 1) in matches and (0, 3, 2) in matches, matches
+text, hits = ac.remove("今日はご視聴ありがとうございました")
+assert text == "今日はございました", text
+assert sorted(hits) == [0, 1, 2], hits
+
+# 短模式串是长模式串的后缀，且单独出现在别处
+ac = AhoCorasick(["チャンネル登録", "登録"])
+text, hits = ac.remove("チャンネル登録お願いします、登録")
+assert text == "お願いします、", text
+assert sorted(hits) == [0, 1], hits
+print("嵌套模式串检查通过")
+
+# ----- 随机对比：清理结果与命中集合都应与逐个 str.find 一致 -----
+random.seed(0)
+for _ in range(20000):
+    patterns = list(
+        dict.fromkeys(
+            "".join(random.choice("abc") for _ in range(random.randint(1, 4)))
+            for _ in range(random.randint(1, 5))
+        )
+    )
+    text = "".join(random.choice("abcd") for _ in range(random.randint(0, 20)))
+    expected_text, expected_hits = remove_naive(text, patterns)
+    actual_text, actual_hits = AhoCorasick(patterns).remove(text)
+    assert actual_text == expected_text, (patterns, text, actual_text, expected_text)
+    assert set(actual_hits) == expected_hits, (patterns, text, actual_hits, expected_hits)
+print("随机对比通过: 20000 组")
@@ -2,10 +2,10 @@ import os
 import sys
 import time
 from faster_whisper import WhisperModel
-import soundfile as sf
 from rich import print
 
 sys.path.append(os.getcwd())
+from utils.audio import PCM16WavReader
 from utils.chrono import format_hms
 from utils.string import get_changed_part
 
@@ -22,16 +22,18 @@ asr_model = WhisperModel(asr_model_path, device="cuda")
 vad_model = WhisperModel(vad_model_path, device="cuda")
 max_sentence_sec = 15.0
 
-wav_numpy, sample_rate = sf.read('data/nekoyashiki_utawaku.wav', dtype='float32')
-wav_numpy = wav_numpy[:int(sample_rate*600)]
+# 内存映射读取，只有送入模型的窗口才转换为 float32
+reader = PCM16WavReader('data/nekoyashiki_utawaku.wav')
+sample_rate = reader.sample_rate
+total_samples = min(len(reader), int(sample_rate*600))
 print(f"采样率: {sample_rate} Hz")
-print(f"数据形状: {wav_numpy.shape}") # (samples, channels)
-print(f"数据类型: {wav_numpy.dtype}")
+print(f"数据形状: {reader.data.shape}") # (samples, channels)
+print(f"数据类型: {reader.data.dtype}")
 
 f = open(os.path.join('data/transcript', 'nekoyashiki_utawaku.txt'), 'w+')
 
 script_start_time = time.time()
-total_audio_duration = len(wav_numpy) / sample_rate
+total_audio_duration = total_samples / sample_rate
 
 last_valid_text = ""
 last_merged_text = ""
@@ -41,9 +43,10 @@ is_speech = False
 
 start_idx = 0  # 当前缓冲区起始采样点
 end_idx = 0  # 当前缓冲区结束采样点
-for i in range(0, len(wav_numpy), int(sample_rate * 1)):
-    end_idx += int(sample_rate * 1)  # 每轮将缓冲区结束点向后推进 1 秒
-    buffer = wav_numpy[start_idx:end_idx].copy()  # 截取当前待识别窗口 [start_idx, end_idx)
+for i in range(0, total_samples, int(sample_rate * 1)):
+    end_idx = min(end_idx + int(sample_rate * 1), total_samples)  # 每轮将缓冲区结束点向后推进 1 秒
+    reader.release(start_idx)  # 起点之前的音频不会再读取，归还页面
+    buffer = reader.read_float32(start_idx, end_idx)  # 截取当前待识别窗口 [start_idx, end_idx)
     timestamp = f'audio->[{format_hms(start_idx / sample_rate)}:{format_hms(end_idx / sample_rate)}]'  # 输出当前窗口时间区间
     print(timestamp)
     f.write(timestamp + '\n')
@@ -215,3 +218,4 @@ f.write(f"脚本总耗时 (Script Duration):        {format_hms(script_duration)
 f.write(f"脚本整体实时率 (Overall RTF):        {script_rtf:.4f}\n")
 
 f.close()
+reader.close()
@@ -2,16 +2,17 @@ import os
 import sys
 import time
 
-import numpy as np
 import soundfile as sf
 from rich.live import Live
 from rich.text import Text
 
 sys.path.append(os.getcwd())
 from asr_engine import ASREngine
-from utils.audio import stream_wav_realtime
+from asr_result import ASRResult
+from utils.audio import FrameAccumulator, stream_wav_realtime
 from utils.chrono import format_hms
 from utils.logging import setup_logger
+from utils.trace import ChromeTracer
 
 
 logger = setup_logger(level="WARNING")
@@ -26,9 +27,12 @@ vad_model_path = "local_models/faster-whisper-tiny"
 max_sentence_sec = 20.0
 
 wav_path = "data/nekoyashiki_utawaku_test.wav"
+# 设置 ASR_TRACE=<path.json> 时把每次 push_chunk 及其各阶段写成 Chrome trace，可在 Perfetto 中打开
+trace_path = os.environ.get("ASR_TRACE")
 audio_info = sf.info(wav_path)
 sample_rate = audio_info.samplerate
 one_second_samples = int(sample_rate * 1.0)
+frame_samples = int(sample_rate * 0.02)
 total_audio_duration = audio_info.duration
 
 logger.info(f"采样率: {sample_rate} Hz")
@@ -44,9 +48,13 @@ engine = ASREngine(
     max_sentence_sec=max_sentence_sec,
     hallucination_blacklist=hallucination_blacklist,
 )
+tracer = ChromeTracer(trace_path) if trace_path else None
+if tracer is not None:
+    engine.profiler.trace(tracer, os.path.basename(wav_path))
 
 
-def handle_result(result: dict, live: Live, output_file) -> None:
+def handle_result(result: ASRResult, live: Live, output_file) -> None:
+    result = result.to_dict()
     if result["status"] == "error":
         raise RuntimeError(f"ASREngine failed: {result.get('error', 'unknown error')}")
 
@@ -103,25 +111,34 @@ transcript_path = os.path.join("data/transcript", "nekoyashiki_utawaku_stream.tx
 
 with open(transcript_path, "w+", encoding="utf-8") as output_file:
     waiting_text = Text("Listening...", style="dim italic blue")
-    pending_audio = np.empty((0,), dtype=np.float32)
+    # 预分配的帧累积器：每 20ms 帧只拷贝一次，攒满 1 秒时返回视图
+    accumulator = FrameAccumulator(frame_samples, one_second_samples)
 
     with Live(waiting_text, refresh_per_second=10) as live:
         for audio_chunk in stream_wav_realtime(wav_path, frame_duration_ms=20, dtype="float32"):
-            pending_audio = np.concatenate([pending_audio, audio_chunk], axis=0)
-
-            while len(pending_audio) >= one_second_samples:
-                one_sec_chunk = pending_audio[:one_second_samples].copy()
-                pending_audio = pending_audio[one_second_samples:]
+            one_sec_chunk = accumulator.push(audio_chunk)
+            if one_sec_chunk is not None:
                 result = engine.push_chunk(one_sec_chunk)
+                start_ns = time.perf_counter_ns()
                 handle_result(result, live, output_file)
-
-        if len(pending_audio) > 0:
-            remainder_result = engine.push_chunk(pending_audio.copy())
+                if tracer is not None:
+                    # 显示与写文件的耗时也放进时间线，便于和引擎内部阶段对照
+                    tracer.complete(
+                        "handle_result",
+                        start_ns,
+                        time.perf_counter_ns(),
+                        track=engine.profiler.track,
+                        category="replay",
+                    )
+
+        remainder = accumulator.flush()
+        if len(remainder) > 0:
+            remainder_result = engine.push_chunk(remainder)
             handle_result(remainder_result, live, output_file)
 
-    finalize_result = engine.finalize()
-    if finalize_result["tail_samples"] > 0:
-        tail_duration = finalize_result["tail_duration_sec"]
+    finalize_result = engine.finalize(len(accumulator))
+    if finalize_result.tail_samples > 0:
+        tail_duration = finalize_result.tail_duration_sec
         remainder_msg = f"[TAIL] 剩余不足1秒音频未触发识别: {tail_duration:.2f}s"
         logger.debug(remainder_msg)
         output_file.write(remainder_msg + "\n")
@@ -139,3 +156,12 @@ with open(transcript_path, "w+", encoding="utf-8") as output_file:
     output_file.write(f"脚本总音频时长 (Total Audio Duration): {format_hms(total_audio_duration)}\n")
     output_file.write(f"脚本总耗时 (Script Duration):        {format_hms(script_duration)}\n")
     output_file.write(f"脚本整体实时率 (Overall RTF):        {script_rtf:.4f}\n")
+
+if tracer is not None:
+    tracer.close()
+    logger.warning(f"trace: {trace_path} ({tracer.event_count} events)")
+    for stage, snapshot in engine.profiler.snapshot().items():
+        logger.warning(
+            f"{stage:<12} n={snapshot['count']:<6} p50={snapshot['p50_ms']:.2f}ms "
+            f"p95={snapshot['p95_ms']:.2f}ms p99={snapshot['p99_ms']:.2f}ms"
+        )
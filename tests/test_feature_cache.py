@@ -0,0 +1,60 @@
+import os
+import sys
+
+import numpy as np
+import soundfile as sf
+from faster_whisper import WhisperModel
+
+sys.path.append(os.getcwd())
+from asr_engine import ASREngine
+
+
+# 启用 feature_cache 前的检查：同一段音频分别走增量 log-mel + generate_segments 与 transcribe()，
+# 特征的内部列应一致，回放得到的每一步结果应完全相同
+asr_model_path = "local_models/faster-whisper-large-v3-turbo-ct2"
+vad_model_path = "local_models/faster-whisper-tiny"
+wav_path = "data/nekoyashiki_utawaku_test.wav"
+device = "cuda"
+replay_sec = 90
+
+asr_model = WhisperModel(asr_model_path, device=device)
+vad_model = WhisperModel(vad_model_path, device=device)
+audio, sample_rate = sf.read(wav_path, dtype="float32", always_2d=True)
+audio = audio.mean(axis=1)[: sample_rate * replay_sec]
+
+# ----- 特征：缓存的 log-mel 与 FeatureExtractor 对比（环形缓冲区 10 秒，窗口会跨越环尾） -----
+engine = ASREngine(asr_model, vad_model, feature_cache=True, max_buffer_sec=10.0)
+assert engine.mel_cache is not None, "feature_cache was disabled, see the warning above"
+hop_length = engine.mel_cache.hop_length
+window_samples = sample_rate * 8
+max_interior_diff = 0.0
+max_edge_diff = 0.0
+for end_idx in range(window_samples, len(audio), sample_rate):
+    engine.audio_cache.write(audio[engine.end_idx : end_idx])
+    start_idx = end_idx - window_samples
+    engine.audio_cache.release(start_idx)
+    cached = engine.window_features(start_idx, end_idx)
+    reference = asr_model.feature_extractor(audio[start_idx - start_idx % hop_length : end_idx])
+    assert cached.shape == reference.shape, (cached.shape, reference.shape)
+    max_interior_diff = max(max_interior_diff, float(np.abs(cached[:, 2:-2] - reference[:, 2:-2]).max()))
+    max_edge_diff = max(max_edge_diff, float(np.abs(cached - reference).max()))
+print(f"log-mel 内部列最大误差 {max_interior_diff:.2e}，含两端列最大误差 {max_edge_diff:.2e}")
+assert max_interior_diff < 1e-3, max_interior_diff
+
+# ----- 识别：两种路径回放同一段音频，逐步比较结果 -----
+engines = {
+    "feature_cache": ASREngine(asr_model, vad_model, feature_cache=True),
+    "transcribe": ASREngine(asr_model, vad_model, feature_cache=False),
+}
+mismatches = 0
+steps = 0
+for start in range(0, len(audio), sample_rate):
+    chunk = audio[start : start + sample_rate]
+    cached, plain = (engine.push_chunk(chunk) for engine in engines.values())
+    steps += 1
+    if (cached.status, cached.merged, cached.delta) != (plain.status, plain.merged, plain.delta):
+        mismatches += 1
+        print(f"[{start / sample_rate:.0f}s] feature_cache: {cached.status} {cached.merged}")
+        print(f"[{start / sample_rate:.0f}s] transcribe:    {plain.status} {plain.merged}")
+print(f"{steps} 步中 {mismatches} 步结果不一致")
+assert mismatches == 0
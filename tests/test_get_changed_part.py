@@ -0,0 +1,92 @@
+import os
+import random
+import sys
+import timeit
+
+sys.path.append(os.getcwd())
+from utils.string import get_changed_part
+
+
+def get_changed_part_legacy(ref_text, new_text):
+    # 旧实现：从最大重叠长度开始逐个尝试，O(n²)
+    if not new_text:
+        return ""
+    if not ref_text:
+        return new_text
+    max_overlap = min(len(ref_text), len(new_text))
+    for i in range(max_overlap, 0, -1):
+        if new_text.startswith(ref_text[-i:]):
+            return new_text[i:]
+    for i in range(0, max_overlap, 1):
+        if new_text[i] != ref_text[i]:
+            return new_text[i:]
+    return new_text
+
+
+random.seed(0)
+alphabet = [chr(c) for c in range(0x3041, 0x3097)]
+
+
+def random_text(n, chars=alphabet):
+    return "".join(random.choice(chars) for _ in range(n))
+
+
+# ----- 正确性：与旧实现逐一比对 -----
+cases = [
+    ("ZABC", "ABCDEF"),
+    ("Hello", "Hello World"),
+    ("Start End", "Start Middle End"),
+    ("Version 1.0", "Version 2.0 Beta"),
+    ("ABC", ""),
+    ("", "ABC"),
+    ("aaaa", "aaaaab"),
+    ("abab", "ababab"),
+    ("abc", "abc"),
+]
+for _ in range(20000):
+    chars = random.choice([alphabet, "ab", "abc"])
+    ref = random_text(random.randint(0, 30), chars)
+    new = random_text(random.randint(0, 30), chars)
+    if ref and random.random() < 0.5:
+        cut = random.randint(0, len(ref))
+        new = ref[cut:] + new
+    cases.append((ref, new))
+
+for ref, new in cases:
+    expected = get_changed_part_legacy(ref, new)
+    actual = get_changed_part(ref, new)
+    assert actual == expected, (ref, new, expected, actual)
+print(f"正确性校验通过: {len(cases)} 组")
+
+# ----- 性能：1k ~ 10k 字符 -----
+print(f"{'场景':<8}{'长度':>8}{'旧实现(ms)':>14}{'新实现(ms)':>14}{'加速比':>10}")
+for n in [1000, 2000, 5000, 10000]:
+    text = random_text(n + n // 10)
+    scenarios = {
+        # 滑动窗口：新文本是旧文本去掉开头并追加新内容（ASR 的典型情况）
+        "sliding": (text[:n], text[n // 10 :]),
+        # 重复字符：重叠很长且锚点极多
+        "repeat": ("あ" * n, "あ" * (n - 1) + "い"),
+        # 最坏情况：旧实现每次 startswith 都要比较到中间才失败，O(n²)
+        "worst": ("あ" * n, "あ" * (n // 2) + "い" + "あ" * (n // 2)),
+        # 无重叠：走到头部匹配兜底
+        "disjoint": (random_text(n, "abc"), random_text(n, "xyz")),
+    }
+    for name, (ref, new) in scenarios.items():
+        number = 3
+        legacy = timeit.timeit(lambda: get_changed_part_legacy(ref, new), number=number) / number
+        current = timeit.timeit(lambda: get_changed_part(ref, new), number=number) / number
+        print(f"{name:<8}{n:>8}{legacy * 1000:>14.3f}{current * 1000:>14.3f}{legacy / current:>10.1f}x")
+
+# ----- 最坏情况必须线性：长度放大 8 倍，耗时放大应远小于 O(n²) 的 64 倍 -----
+def worst_case_sec(n, func):
+    ref, new = "あ" * n, "あ" * (n // 2) + "い" + "あ" * (n // 2)
+    return min(timeit.repeat(lambda: func(ref, new), number=1, repeat=5))
+
+
+small = worst_case_sec(5000, get_changed_part)
+large = worst_case_sec(40000, get_changed_part)
+legacy_large = worst_case_sec(40000, get_changed_part_legacy)
+print(f"最坏情况: 5k {small * 1000:.2f}ms, 40k {large * 1000:.2f}ms (旧实现 {legacy_large * 1000:.2f}ms)")
+assert large / small < 16, f"worst case scales super-linearly: {large / small:.1f}x for 8x input"
+assert large < legacy_large, "worst case at 40k should beat the quadratic legacy scan"
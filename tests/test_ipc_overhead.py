@@ -0,0 +1,98 @@
+import multiprocessing as mp
+import os
+import pickle
+import sys
+import time
+
+import numpy as np
+
+sys.path.append(os.getcwd())
+from asr_result import STATUS_PARTIAL, ASRResult
+from runtime import InferenceRuntime
+from utils.ring_buffer import AudioRingBuffer
+
+
+sample_rate = 16000
+chunk_sec = 1.0
+audio_sec = 600
+chunk_samples = int(sample_rate * chunk_sec)
+
+
+class WindowEngine:
+    """
+    不加载模型的占位引擎：只读取窗口并释放，用于单独测量 IPC 开销。
+    """
+
+    def __init__(self, audio_cache: AudioRingBuffer) -> None:
+        self.audio_cache = audio_cache
+
+    def process(self, reasons: list[str] | None = None) -> ASRResult:
+        cache = self.audio_cache
+        window = cache.window(cache.start_idx, cache.end_idx)
+        result = ASRResult(STATUS_PARTIAL, reasons=reasons)
+        result.set_metric("peak", float(window[-1]))
+        cache.release(cache.end_idx)
+        return result
+
+
+def pickle_worker(input_queue: mp.Queue, output_queue: mp.Queue) -> None:
+    engine = WindowEngine(AudioRingBuffer(int(sample_rate * 30.0)))
+    while True:
+        chunk = input_queue.get()
+        if chunk is None:
+            break
+        engine.audio_cache.write(chunk)
+        output_queue.put(engine.process())
+
+
+def run_pickle(chunks: list[np.ndarray]) -> tuple[int, float]:
+    context = mp.get_context("spawn")
+    input_queue = context.Queue()
+    output_queue = context.Queue()
+    worker = context.Process(target=pickle_worker, args=(input_queue, output_queue), daemon=True)
+    worker.start()
+    # 预热：等待子进程启动完成
+    input_queue.put(chunks[0])
+    output_queue.get()
+
+    start = time.perf_counter()
+    for chunk in chunks:
+        input_queue.put(chunk)
+        output_queue.get()
+    total_sec = time.perf_counter() - start
+    input_queue.put(None)
+    worker.join()
+    return len(pickle.dumps(chunks[0])), total_sec
+
+
+def run_shared(chunks: list[np.ndarray]) -> tuple[int, float]:
+    runtime = InferenceRuntime(WindowEngine, sample_rate=sample_rate, min_process_sec=chunk_sec)
+    runtime.start()
+    runtime.open_session("bench")
+    runtime.write("bench", chunks[0])
+    runtime.get_result()
+
+    start = time.perf_counter()
+    for chunk in chunks:
+        runtime.write("bench", chunk)
+        session_id, result = runtime.get_result()
+        assert session_id == "bench" and result.get_metric("peak") == chunk[-1], result
+    total_sec = time.perf_counter() - start
+    runtime.close_session("bench")
+    assert runtime.get_result() == ("bench", None)
+    runtime.stop()
+    return len(pickle.dumps(("audio", "bench", 0, len(chunks) * chunk_samples))), total_sec
+
+
+if __name__ == "__main__":
+    rng = np.random.default_rng(0)
+    chunks = [
+        rng.uniform(-1.0, 1.0, chunk_samples).astype(np.float32)
+        for _ in range(int(audio_sec / chunk_sec))
+    ]
+    print(f"音频: {audio_sec}s, 每块 {chunk_sec:.1f}s ({chunk_samples * 4} bytes)")
+    # 往返时间包含网关侧写入、队列传输、Worker 读取窗口与结果回传，按每秒音频折算
+    print(f"{'方式':<20}{'队列消息(bytes)':>18}{'往返(us/s)':>14}")
+    for name, run in [("pickle numpy", run_pickle), ("shared memory", run_shared)]:
+        message_bytes, total_sec = run(chunks)
+        print(f"{name:<20}{message_bytes:>18}{total_sec / audio_sec * 1e6:>14.1f}")
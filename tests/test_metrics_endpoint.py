@@ -0,0 +1,137 @@
+import os
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+
+sys.path.append(os.getcwd())
+from asr_metrics import ASRMetrics, MetricsServer
+from asr_result import ASRResult
+
+
+def scrape(port: int) -> dict[str, float]:
+    with urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics", timeout=5) as response:
+        assert response.status == 200
+        assert response.headers["Content-Type"].startswith("text/plain")
+        text = response.read().decode()
+    samples = {}
+    for line in text.splitlines():
+        if line and not line.startswith("#"):
+            name, value = line.rsplit(" ", 1)
+            samples[name] = float(value)
+    return samples
+
+
+metrics = ASRMetrics()
+server = MetricsServer(metrics, "127.0.0.1", 0).start()
+print(f"metrics on http://127.0.0.1:{server.port}/metrics")
+
+# ----- 正确性：模拟两个会话的一串结果 -----
+metrics.open_session("s1")
+metrics.open_session("s2")
+metrics.observe("s1", ASRResult("buffering", reasons=["insufficient_window"], cache_samples=8000))
+metrics.observe("s1", ASRResult("no_speech", vad_ran=True, reasons=["vad_no_speech"]))
+metrics.observe(
+    "s2",
+    ASRResult(
+        "partial",
+        window_start_sec=0.0,
+        window_end_sec=4.0,
+        asr_duration_sec=0.8,
+        audio_duration_sec=4.0,
+        cache_samples=64000,
+        reasons=["segment_gap", "hallucination_removed"],
+    ),
+)
+metrics.observe(
+    "s2",
+    ASRResult(
+        "committed",
+        window_start_sec=0.0,
+        window_end_sec=21.0,
+        asr_duration_sec=4.2,
+        audio_duration_sec=21.0,
+        cache_samples=16000,
+        reasons=["stable_x3", "long_segment", "local_agreement_x17", "made_up_reason"],
+    ),
+)
+metrics.observe("s1", ASRResult("error", error="boom", reasons=["error"], cache_samples=3200))
+
+samples = scrape(server.port)
+expected = {
+    "asr_active_sessions": 2,
+    'asr_pushes_total{status="buffering"}': 1,
+    'asr_pushes_total{status="no_speech"}': 1,
+    'asr_pushes_total{status="partial"}': 1,
+    'asr_pushes_total{status="committed"}': 1,
+    'asr_pushes_total{status="error"}': 1,
+    'asr_invocations_total{kind="vad"}': 1,
+    'asr_invocations_total{kind="asr"}': 2,
+    'asr_rtf_bucket{le="0.2"}': 2,
+    'asr_rtf_bucket{le="+Inf"}': 2,
+    'asr_window_seconds_bucket{le="5.0"}': 1,
+    'asr_window_seconds_bucket{le="25.0"}': 2,
+    "asr_window_seconds_sum": 25.0,
+    "asr_buffer_samples": 3200 + 16000,
+    'asr_reasons_total{reason="stable"}': 1,
+    'asr_reasons_total{reason="local_agreement"}': 1,
+    'asr_reasons_total{reason="other"}': 1,
+    'asr_reasons_total{reason="energy_gate"}': 0,
+    'asr_reason_count_bucket{reason="stable",le="3.0"}': 1,
+    'asr_reason_count_bucket{reason="local_agreement",le="16.0"}': 0,
+    'asr_reason_count_bucket{reason="local_agreement",le="+Inf"}': 1,
+    'asr_reason_count_sum{reason="local_agreement"}': 17,
+    'asr_reasons_total{reason="long_segment"}': 1,
+    'asr_reasons_total{reason="hallucination_removed"}': 1,
+}
+for name, value in expected.items():
+    assert samples.get(name) == value, (name, samples.get(name), value)
+# 带计数的原因不会作为标签出现
+assert not any("_x" in name for name in samples if name.startswith("asr_reasons_total")), samples
+
+metrics.close_session("s1")
+samples = scrape(server.port)
+assert samples["asr_active_sessions"] == 1
+assert samples["asr_buffer_samples"] == 16000
+
+try:
+    urllib.request.urlopen(f"http://127.0.0.1:{server.port}/other", timeout=5)
+    raise AssertionError("expected 404")
+except urllib.error.HTTPError as exc:
+    assert exc.code == 404
+print("正确性检查通过")
+
+# ----- 抓取不阻塞结果路径：持续抓取时测量 observe 的耗时 -----
+stop = threading.Event()
+scrapes = 0
+
+
+def scrape_loop() -> None:
+    global scrapes
+    while not stop.is_set():
+        scrape(server.port)
+        scrapes += 1
+
+
+result = ASRResult("partial", window_end_sec=3.0, asr_duration_sec=0.3, audio_duration_sec=3.0)
+n = 100000
+start = time.perf_counter()
+for i in range(n):
+    metrics.observe("s2", result)
+idle_us = (time.perf_counter() - start) / n * 1e6
+
+thread = threading.Thread(target=scrape_loop)
+thread.start()
+start = time.perf_counter()
+worst_us = 0.0
+for i in range(n):
+    t = time.perf_counter()
+    metrics.observe("s2", result)
+    worst_us = max(worst_us, (time.perf_counter() - t) * 1e6)
+busy_us = (time.perf_counter() - start) / n * 1e6
+stop.set()
+thread.join()
+server.close()
+
+print(f"observe: 空闲 {idle_us:.2f}us, 抓取期间 {busy_us:.2f}us (最慢 {worst_us:.0f}us, 抓取 {scrapes} 次)")
@@ -0,0 +1,70 @@
+import os
+import sys
+import time
+
+import soundfile as sf
+from faster_whisper import WhisperModel
+
+sys.path.append(os.getcwd())
+from asr_engine import ASREngine
+from offline import transcribe_file
+from utils.chrono import format_hms
+
+
+# 同一文件分别走流式回放（不按实时节奏，尽快推送）与离线批处理，比较整体 RTF
+hallucination_blacklist = [
+    "ご視聴ありがとうございました",
+    "チャンネル登録をお願いいたします",
+]
+
+asr_model_path = "local_models/faster-whisper-large-v3-turbo-ct2"
+vad_model_path = "local_models/faster-whisper-tiny"
+wav_path = "data/nekoyashiki_utawaku_test.wav"
+device = "cuda"
+workers = 4
+
+audio_info = sf.info(wav_path)
+sample_rate = audio_info.samplerate
+total_audio_duration = audio_info.duration
+print(f"音频: {wav_path}  时长: {format_hms(total_audio_duration)}")
+
+# ----- 流式：每次推送 1 秒 -----
+engine = ASREngine(
+    asr_model_path=asr_model_path,
+    vad_model_path=vad_model_path,
+    device=device,
+    sample_rate=sample_rate,
+    min_process_sec=1.0,
+    hallucination_blacklist=hallucination_blacklist,
+)
+stream_text = []
+partial_text = ""
+start_time = time.time()
+for block in sf.blocks(wav_path, blocksize=sample_rate, dtype="float32", always_2d=True):
+    result = engine.push_chunk(block.mean(axis=1))
+    if result.status == "committed":
+        stream_text.append(result.merged)
+        partial_text = ""
+    elif result.status == "partial":
+        partial_text = result.merged
+# 文件结束时尚未提交的部分也计入
+stream_text.append(partial_text)
+stream_sec = time.time() - start_time
+
+# ----- 离线：VAD 切块后并行识别 -----
+offline_model = WhisperModel(asr_model_path, device=device, num_workers=workers)
+offline = transcribe_file(
+    wav_path,
+    offline_model,
+    workers=workers,
+    hallucination_blacklist=hallucination_blacklist,
+)
+offline_sec = offline["metrics"]["processing_sec"]
+
+print("=" * 30)
+print(f"流式: 耗时 {format_hms(stream_sec)}  RTF {stream_sec / total_audio_duration:.4f}  字数 {len(''.join(stream_text))}")
+print(
+    f"离线: 耗时 {format_hms(offline_sec)}  RTF {offline['metrics']['rtf']:.4f}  字数 {len(offline['text'])}  "
+    f"分块 {offline['metrics']['chunks']}  VAD {offline['metrics']['vad_duration_sec']:.2f}s"
+)
+print(f"离线相对流式加速: {stream_sec / offline_sec:.1f}x" if offline_sec > 0 else "")
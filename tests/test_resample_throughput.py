@@ -0,0 +1,101 @@
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.append(os.getcwd())
+from utils.resample import StreamingResampler, resample_audio
+
+
+frame_duration_ms = 20
+audio_sec = 10
+stream_counts = [1, 100, 300]
+formats = [(48000, 2), (44100, 2), (48000, 1), (8000, 1)]
+
+
+def make_pcm(sample_rate: int, channels: int) -> np.ndarray:
+    rng = np.random.default_rng(0)
+    t = np.arange(sample_rate * audio_sec) / sample_rate
+    audio = 0.3 * np.sin(2 * np.pi * 440 * t) + 0.05 * rng.standard_normal(len(t))
+    audio = np.repeat(audio[:, None], channels, axis=1)
+    return (audio * 32767).astype("<i2")
+
+
+def check_boundaries(pcm: np.ndarray, sample_rate: int, channels: int) -> float:
+    """
+    逐帧流式处理与整段一次性处理的最大差值，用来确认帧边界没有不连续。
+    """
+    frame_samples = sample_rate * frame_duration_ms // 1000
+    resampler = StreamingResampler(sample_rate, 16000, channels)
+    parts = [
+        resampler.process(pcm[idx : idx + frame_samples].reshape(-1))
+        for idx in range(0, len(pcm), frame_samples)
+    ]
+    parts.append(resampler.process(np.zeros((0,), dtype=np.int16), final=True))
+    streamed = np.concatenate(parts)
+    whole = resample_audio(pcm.reshape(-1), sample_rate, 16000, channels)
+    assert len(streamed) == len(whole)
+    return float(np.abs(streamed - whole).max())
+
+
+def tone_gain_db(sample_rate: int, freq: float) -> float:
+    """
+    单频正弦经重采样后的幅度增益（dB），去掉两端滤波器暂态后按 RMS 计算。
+    """
+    t = np.arange(sample_rate * 2) / sample_rate
+    tone = np.sin(2 * np.pi * freq * t).astype(np.float32)
+    output = resample_audio(tone, sample_rate, 16000)[4000:-4000]
+    return float(20 * np.log10(np.sqrt(2 * np.mean(output**2)) + 1e-12))
+
+
+def check_response(sample_rate: int) -> tuple[float, float]:
+    """
+    降采样到 16k 时的通带衰减（7kHz 以内最差）与阻带抑制（9kHz 以上最差，会混叠回 7kHz 以内）。
+    """
+    passband_loss = -min(tone_gain_db(sample_rate, freq) for freq in (1000, 4000, 7000))
+    stopband = [9000, 10000, 12000, 16000, sample_rate // 2 - 1000]
+    stopband_rejection = -max(tone_gain_db(sample_rate, freq) for freq in stopband)
+    return passband_loss, stopband_rejection
+
+
+def run(pcm: np.ndarray, sample_rate: int, channels: int, streams: int) -> float:
+    """
+    streams 路并发流轮流各送一帧（与网关事件循环的调度方式一致），返回每帧平均耗时（秒）。
+    """
+    frame_samples = sample_rate * frame_duration_ms // 1000
+    frames = [
+        pcm[idx : idx + frame_samples].tobytes()
+        for idx in range(0, len(pcm) - frame_samples + 1, frame_samples)
+    ]
+    resamplers = [StreamingResampler(sample_rate, 16000, channels) for _ in range(streams)]
+    rounds = max(1, len(frames) * 10 // streams)
+    start = time.perf_counter()
+    for i in range(rounds):
+        frame = frames[i % len(frames)]
+        for resampler in resamplers:
+            resampler.process_pcm16(frame)
+    return (time.perf_counter() - start) / (rounds * streams)
+
+
+if __name__ == "__main__":
+    frames_per_sec = 1000 / frame_duration_ms
+    for sample_rate in (44100, 48000):
+        passband_loss, stopband_rejection = check_response(sample_rate)
+        print(f"{sample_rate}Hz: 7kHz 以内衰减 {passband_loss:.2f}dB，9kHz 以上抑制 {stopband_rejection:.1f}dB")
+        assert passband_loss < 0.5, passband_loss
+        assert stopband_rejection > 70, stopband_rejection
+
+    print(f"帧长: {frame_duration_ms}ms, 输出 16000Hz 单声道")
+    print(f"{'输入格式':<16}{'并发流':>8}{'每帧(us)':>12}{'单核可承载流数':>18}{'帧边界误差':>14}")
+    for sample_rate, channels in formats:
+        pcm = make_pcm(sample_rate, channels)
+        boundary_error = check_boundaries(pcm, sample_rate, channels)
+        for streams in stream_counts:
+            frame_sec = run(pcm, sample_rate, channels, streams)
+            # 单核每秒能处理的帧数 / 每路每秒的帧数
+            capacity = 1 / frame_sec / frames_per_sec
+            print(
+                f"{f'{sample_rate}Hz x{channels}':<16}{streams:>8}{frame_sec * 1e6:>12.1f}"
+                f"{capacity:>18.0f}{boundary_error:>14.1e}"
+            )
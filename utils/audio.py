@@ -1,3 +1,4 @@
+import mmap
 import soundfile as sf
 import time
 import numpy as np
@@ -50,6 +51,210 @@ def stream_wav_realtime(wav_path, frame_duration_ms=20, dtype="float32"):
         
     print("音频流处理完毕。")
 
+def frame_energy(audio, frame_samples):
+    """
+    按帧计算 RMS 与峰值（全部向量化，不产生与音频等长的临时数组）。
+    不足一帧的尾部单独算作一帧。返回 (rms, peak) 两个 float32 数组。
+    """
+    audio = np.asarray(audio, dtype=np.float32).reshape(-1)
+    n_full = len(audio) // frame_samples
+    frames = audio[: n_full * frame_samples].reshape(n_full, frame_samples)
+    sum_sq = np.einsum("ij,ij->i", frames, frames)
+    peak = np.maximum(frames.max(axis=1, initial=0.0), -frames.min(axis=1, initial=0.0))
+    counts = np.full(n_full, frame_samples, dtype=np.float32)
+
+    tail = audio[n_full * frame_samples :]
+    if len(tail) > 0:
+        sum_sq = np.append(sum_sq, np.dot(tail, tail))
+        peak = np.append(peak, max(tail.max(), -tail.min()))
+        counts = np.append(counts, len(tail))
+
+    rms = np.sqrt(sum_sq / counts).astype(np.float32)
+    return rms, peak.astype(np.float32)
+
+def is_silent(audio, frame_samples, rms_threshold=None, peak_threshold=None):
+    """
+    能量门限：所有帧的 RMS 与峰值都低于阈值时判定为静音。阈值为 None 表示不参与判断。
+    """
+    if rms_threshold is None and peak_threshold is None:
+        return False
+    rms, peak = frame_energy(audio, frame_samples)
+    if rms_threshold is not None and np.any(rms >= rms_threshold):
+        return False
+    if peak_threshold is not None and np.any(peak >= peak_threshold):
+        return False
+    return True
+
+class PCM16WavReader:
+    """
+    以内存映射方式读取 PCM16 WAV 的 data 块，按需返回任意区间的零拷贝 int16 视图。
+    只有实际送入模型的窗口才转换为 float32；调用 release() 归还已处理区间的页面，
+    常驻内存只取决于窗口长度，与文件长度无关。
+    """
+
+    def __init__(self, wav_path):
+        with open(wav_path, "rb") as f:
+            header = f.read(12)
+            if len(header) < 12 or header[:4] != b"RIFF" or header[8:12] != b"WAVE":
+                raise ValueError(f"{wav_path} is not a RIFF/WAVE file")
+            fmt = None
+            data_offset = data_size = None
+            # 逐个遍历 chunk，跳过 LIST 等无关块；chunk 按偶数字节对齐
+            while True:
+                chunk_header = f.read(8)
+                if len(chunk_header) < 8:
+                    break
+                chunk_id = chunk_header[:4]
+                chunk_size = int.from_bytes(chunk_header[4:], "little")
+                if chunk_id == b"fmt ":
+                    fmt = f.read(chunk_size)
+                    f.seek(chunk_size % 2, 1)
+                elif chunk_id == b"data":
+                    data_offset = f.tell()
+                    data_size = chunk_size
+                    break
+                else:
+                    f.seek(chunk_size + chunk_size % 2, 1)
+            file_size = f.seek(0, 2)
+
+        if fmt is None or data_offset is None:
+            raise ValueError(f"{wav_path} has no fmt or data chunk")
+        audio_format = int.from_bytes(fmt[0:2], "little")
+        if audio_format == 0xFFFE and len(fmt) >= 26:
+            # WAVE_FORMAT_EXTENSIBLE：真实格式在 SubFormat GUID 的前两个字节
+            audio_format = int.from_bytes(fmt[24:26], "little")
+        bits_per_sample = int.from_bytes(fmt[14:16], "little")
+        if audio_format != 1 or bits_per_sample != 16:
+            raise ValueError(f"{wav_path} is not 16-bit PCM (format {audio_format}, {bits_per_sample} bits)")
+
+        self.channels = int.from_bytes(fmt[2:4], "little")
+        self.sample_rate = int.from_bytes(fmt[4:8], "little")
+        # 录音中断时 data 块长度可能大于实际文件，以文件实际大小为准
+        data_size = min(data_size, file_size - data_offset)
+        self.frames = data_size // (2 * self.channels)
+        self.data_offset = data_offset
+        with open(wav_path, "rb") as f:
+            self.mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self.data = np.frombuffer(
+            self.mmap, dtype="<i2", count=self.frames * self.channels, offset=data_offset
+        ).reshape(self.frames, self.channels)
+
+    def __len__(self):
+        return self.frames
+
+    @property
+    def duration(self):
+        return self.frames / self.sample_rate
+
+    def window(self, start_idx, end_idx):
+        """
+        返回 [start_idx, end_idx) 的 int16 视图，形状 (n, channels)，不拷贝数据。
+        """
+        return self.data[max(0, start_idx) : min(end_idx, self.frames)]
+
+    def read_float32(self, start_idx, end_idx, out=None):
+        """
+        把 [start_idx, end_idx) 转换为单声道 float32（多声道取平均）。
+        传入 out 时写入 out 的前 n 个采样点并返回该视图，避免重复申请内存。
+        """
+        view = self.window(start_idx, end_idx)
+        n = len(view)
+        if out is None:
+            out = np.empty((n,), dtype=np.float32)
+        else:
+            out = out[:n]
+        if self.channels == 1:
+            np.multiply(view[:, 0], 1.0 / 32768.0, out=out, casting="unsafe")
+        else:
+            np.mean(view, axis=1, dtype=np.float32, out=out)
+            out *= 1.0 / 32768.0
+        return out
+
+    def release(self, end_idx):
+        """
+        告知内核 end_idx 之前的采样点不再需要，让对应页面移出常驻内存（再次访问时会重新从文件读入）。
+        """
+        if not hasattr(mmap, "MADV_DONTNEED"):
+            return
+        end_byte = self.data_offset + min(end_idx, self.frames) * 2 * self.channels
+        end_byte -= end_byte % mmap.PAGESIZE
+        if end_byte > 0:
+            self.mmap.madvise(mmap.MADV_DONTNEED, 0, end_byte)
+
+    def blocks(self, block_samples, start_idx=0):
+        """
+        从 start_idx 开始按 block_samples 依次产出 int16 视图，最后一块可能不足 block_samples；
+        产出下一块前释放上一块的页面。
+        """
+        for idx in range(start_idx, self.frames, block_samples):
+            self.release(idx)
+            yield self.window(idx, idx + block_samples)
+
+    def close(self):
+        self.data = None
+        try:
+            self.mmap.close()
+        except BufferError:
+            # 仍有外部视图引用映射，等它们释放后由垃圾回收关闭
+            pass
+
+class FrameAccumulator:
+    """
+    把固定长度的音频帧（如 20ms）攒成 chunk_samples 长的块（如 min_process_sec）。
+    内部只有一块预分配的缓冲区，push() 每帧只做一次拷贝，攒满时返回缓冲区的视图，不产生新数组。
+    返回的视图在下一次 push() / flush() 之前有效；调用方需要保留时应自行拷贝（ASREngine.push_chunk 会写入自己的缓冲区）。
+    """
+
+    def __init__(self, frame_samples, chunk_samples, dtype=np.float32):
+        if frame_samples <= 0 or chunk_samples <= 0:
+            raise ValueError("frame_samples and chunk_samples must be positive")
+        self.frame_samples = frame_samples
+        self.chunk_samples = chunk_samples
+        # 攒满一块时最多溢出不到一帧，余量放在块之后
+        self.buffer = np.zeros((chunk_samples + frame_samples,), dtype=dtype)
+        self.reset()
+
+    def reset(self):
+        self.fill = 0
+        # 上一次返回的块长度，下一次写入前才把其后的余量挪到开头，保证返回的视图在此之前不被改写
+        self.emitted = 0
+
+    def __len__(self):
+        """
+        尚未作为块返回的采样点数（即不足一块的尾部）。
+        """
+        return self.fill - self.emitted
+
+    def _compact(self):
+        if self.emitted:
+            rest = self.fill - self.emitted
+            self.buffer[:rest] = self.buffer[self.emitted : self.fill]
+            self.fill = rest
+            self.emitted = 0
+
+    def push(self, frame):
+        """
+        追加一帧；攒满 chunk_samples 时返回该块的视图，否则返回 None。
+        """
+        frame = np.asarray(frame).reshape(-1)
+        if len(frame) != self.frame_samples:
+            raise ValueError(f"frame has {len(frame)} samples, expected {self.frame_samples}")
+        self._compact()
+        self.buffer[self.fill : self.fill + self.frame_samples] = frame
+        self.fill += self.frame_samples
+        if self.fill < self.chunk_samples:
+            return None
+        self.emitted = self.chunk_samples
+        return self.buffer[: self.chunk_samples]
+
+    def flush(self):
+        """
+        返回剩余不足一块的尾部视图（可能为空）并清空累积器。
+        """
+        self._compact()
+        self.emitted = self.fill
+        return self.buffer[: self.fill]
+
 # 使用示例
 if __name__ == "__main__":
     # 请替换为你的音频文件路径
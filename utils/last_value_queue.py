@@ -0,0 +1,36 @@
+from typing import Any, Hashable
+
+
+class LastValueQueue:
+    """
+    按 key 只保留最新值的队列。
+    同一 key 在被取出前多次写入时，旧值被覆盖并计入 skipped；
+    不同 key 按首次写入的先后顺序取出，避免某个会话长期占用 Worker。
+    """
+
+    def __init__(self) -> None:
+        # key -> (value, skipped)，dict 的插入顺序即排队顺序
+        self.slots: dict[Hashable, tuple[Any, int]] = {}
+
+    def __len__(self) -> int:
+        return len(self.slots)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self.slots
+
+    def put(self, key: Hashable, value: Any) -> None:
+        slot = self.slots.get(key)
+        if slot is None:
+            self.slots[key] = (value, 0)
+        else:
+            # 覆盖旧值但保留排队位置
+            self.slots[key] = (value, slot[1] + 1)
+
+    def pop(self, key: Hashable | None = None) -> tuple[Hashable, Any, int]:
+        """
+        取出指定 key（缺省为排在最前的 key），返回 (key, value, skipped)。
+        """
+        if key is None:
+            key = next(iter(self.slots))
+        value, skipped = self.slots.pop(key)
+        return key, value, skipped
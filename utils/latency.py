@@ -0,0 +1,236 @@
+import threading
+import time
+from typing import Any
+
+from utils.trace import ChromeTracer
+
+
+# ASREngine 一次识别依次经过的阶段；queue 为批量调度中等待组批的时间
+STAGE_APPEND = "append"
+STAGE_WINDOW = "window"
+STAGE_VAD = "vad"
+STAGE_ENDPOINT = "endpoint"
+STAGE_QUEUE = "queue"
+STAGE_FEATURES = "features"
+STAGE_PARTIAL_ASR = "partial_asr"
+STAGE_ASR = "asr"
+STAGE_SEGMENTS = "segments"
+STAGE_DIFF = "diff"
+STAGE_FILTER = "filter"
+STAGES = [
+    STAGE_APPEND,
+    STAGE_WINDOW,
+    STAGE_VAD,
+    STAGE_ENDPOINT,
+    STAGE_QUEUE,
+    STAGE_FEATURES,
+    STAGE_PARTIAL_ASR,
+    STAGE_ASR,
+    STAGE_SEGMENTS,
+    STAGE_DIFF,
+    STAGE_FILTER,
+]
+
+# 每个 2 的幂区间再等分为 2 ** SUB_BUCKET_BITS 个桶，分位数的相对误差不超过 1 / 16
+SUB_BUCKET_BITS = 4
+SUB_BUCKETS = 1 << SUB_BUCKET_BITS
+# 最大可区分 2 ** 44 ns（约 4.9 小时），更大的值计入最后一个桶
+MAX_BITS = 44
+BUCKET_COUNT = (MAX_BITS - SUB_BUCKET_BITS) * SUB_BUCKETS + SUB_BUCKETS
+
+
+def bucket_index(value_ns: int) -> int:
+    if value_ns < 2 * SUB_BUCKETS:
+        return max(value_ns, 0)
+    shift = value_ns.bit_length() - SUB_BUCKET_BITS - 1
+    return min(shift * SUB_BUCKETS + (value_ns >> shift), BUCKET_COUNT - 1)
+
+
+def bucket_bounds(index: int) -> tuple[int, int]:
+    """
+    桶 index 覆盖的取值范围 [low, high)。
+    """
+    if index < 2 * SUB_BUCKETS:
+        return index, index + 1
+    shift = index // SUB_BUCKETS - 1
+    mantissa = index - shift * SUB_BUCKETS
+    return mantissa << shift, (mantissa + 1) << shift
+
+
+class LatencyHistogram:
+    """
+    对数分桶的耗时直方图（单位 ns），记录一次只需一次位运算和几次整数加法。
+    """
+
+    def __init__(self) -> None:
+        self.counts = [0] * BUCKET_COUNT
+        self.count = 0
+        self.total_ns = 0
+        self.max_ns = 0
+
+    def record(self, value_ns: int) -> None:
+        # 与 bucket_index() 相同，内联以省去一次函数调用
+        if value_ns < 2 * SUB_BUCKETS:
+            index = max(value_ns, 0)
+        else:
+            shift = value_ns.bit_length() - SUB_BUCKET_BITS - 1
+            index = min(shift * SUB_BUCKETS + (value_ns >> shift), BUCKET_COUNT - 1)
+        self.counts[index] += 1
+        self.count += 1
+        self.total_ns += value_ns
+        if value_ns > self.max_ns:
+            self.max_ns = value_ns
+
+    def copy(self) -> "LatencyHistogram":
+        histogram = LatencyHistogram()
+        histogram.counts = list(self.counts)
+        histogram.count = self.count
+        histogram.total_ns = self.total_ns
+        histogram.max_ns = self.max_ns
+        return histogram
+
+    def merge(self, other: "LatencyHistogram") -> None:
+        for index, count in enumerate(other.counts):
+            if count:
+                self.counts[index] += count
+        self.count += other.count
+        self.total_ns += other.total_ns
+        self.max_ns = max(self.max_ns, other.max_ns)
+
+    def percentile(self, q: float) -> int:
+        """
+        第 q 百分位（0 < q <= 100）所在桶的中点，不超过实际最大值。
+        """
+        if self.count == 0:
+            return 0
+        rank = max(1, -(-self.count * q // 100))
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                low, high = bucket_bounds(index)
+                return min((low + high) // 2, self.max_ns)
+        return self.max_ns
+
+    def snapshot(self) -> dict[str, float]:
+        return {
+            "count": self.count,
+            "mean_ms": self.total_ns / self.count / 1e6 if self.count else 0.0,
+            "p50_ms": self.percentile(50) / 1e6,
+            "p95_ms": self.percentile(95) / 1e6,
+            "p99_ms": self.percentile(99) / 1e6,
+            "max_ms": self.max_ns / 1e6,
+        }
+
+
+class StageHistograms:
+    """
+    按阶段名分组的直方图。thread_safe=True 时每次记录都加锁，用于被多个线程共享的进程级汇总。
+    """
+
+    def __init__(self, thread_safe: bool = False) -> None:
+        self.histograms: dict[str, LatencyHistogram] = {}
+        self.lock = threading.Lock() if thread_safe else None
+
+    def record(self, stage: str, value_ns: int) -> None:
+        histogram = self.histograms.get(stage)
+        if histogram is None:
+            histogram = self.histograms.setdefault(stage, LatencyHistogram())
+        if self.lock is None:
+            histogram.record(value_ns)
+        else:
+            with self.lock:
+                histogram.record(value_ns)
+
+    def snapshot(self) -> dict[str, dict[str, float]]:
+        """
+        {stage: {count, mean_ms, p50_ms, p95_ms, p99_ms, max_ms}}，按 STAGES 的顺序排列。
+        """
+        if self.lock is None:
+            histograms = self.histograms
+        else:
+            # 锁内只复制计数，分位数在锁外计算，避免阻塞正在记录的线程
+            with self.lock:
+                histograms = {stage: histogram.copy() for stage, histogram in self.histograms.items()}
+        order = {stage: i for i, stage in enumerate(STAGES)}
+        return {
+            stage: histograms[stage].snapshot()
+            for stage in sorted(histograms, key=lambda stage: order.get(stage, len(order)))
+        }
+
+    def reset(self) -> None:
+        self.histograms = {}
+
+
+# 进程内所有引擎共享的汇总
+PROCESS_STAGES = StageHistograms(thread_safe=True)
+
+
+def process_snapshot() -> dict[str, dict[str, float]]:
+    return PROCESS_STAGES.snapshot()
+
+
+class StageProfiler:
+    """
+    ASREngine 的阶段计时器。用法：
+
+        t = profiler.now()
+        ...  # 阶段 A
+        t = profiler.lap(STAGE_A, t)
+        ...  # 阶段 B
+        t = profiler.lap(STAGE_B, t)
+
+    lap() 记录 [t, 当前时刻] 这一段并返回当前时刻，相邻阶段共用一次时钟读取。
+    enabled=False 时两个方法都直接返回 0，不读时钟也不记录。
+    挂上 tracer 后每个阶段同时写成 track 轨道上的 trace 事件。
+    """
+
+    def __init__(self, enabled: bool = True, shared: StageHistograms | None = PROCESS_STAGES) -> None:
+        self.enabled = enabled
+        self.stages = StageHistograms()
+        self.shared = shared
+        self.tracer: ChromeTracer | None = None
+        self.track = ""
+
+    def trace(self, tracer: ChromeTracer | None, track: str = "main") -> None:
+        """
+        开始（tracer 为 None 时停止）把阶段写入 tracer；挂上 tracer 会同时启用计时。
+        """
+        self.tracer = tracer
+        self.track = track
+        if tracer is not None:
+            self.enabled = True
+
+    def now(self) -> int:
+        if not self.enabled:
+            return 0
+        return time.perf_counter_ns()
+
+    def lap(self, stage: str, start_ns: int) -> int:
+        if not self.enabled:
+            return 0
+        end_ns = time.perf_counter_ns()
+        self.record(stage, start_ns, end_ns)
+        return end_ns
+
+    def record(self, stage: str, start_ns: int, end_ns: int) -> None:
+        if not self.enabled:
+            return
+        self.stages.record(stage, end_ns - start_ns)
+        if self.shared is not None:
+            self.shared.record(stage, end_ns - start_ns)
+        if self.tracer is not None:
+            self.tracer.complete(stage, start_ns, end_ns, track=self.track)
+
+    def trace_span(self, name: str, start_ns: int, args: dict[str, Any] | None = None) -> None:
+        """
+        只写 trace 不计入直方图的外层区间（如整个 push_chunk），结束时刻为当前时刻。
+        """
+        if self.tracer is not None:
+            self.tracer.complete(name, start_ns, time.perf_counter_ns(), track=self.track, args=args)
+
+    def snapshot(self) -> dict[str, dict[str, float]]:
+        return self.stages.snapshot()
+
+    def reset(self) -> None:
+        self.stages.reset()
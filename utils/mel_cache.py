@@ -0,0 +1,103 @@
+import numpy as np
+
+
+class LogMelCache:
+    """
+    与音频环形缓冲区按绝对采样点索引对齐的 log-mel 特征缓存。
+    第 c 列以采样点 c * hop_length 为中心，覆盖 [c * hop_length - n_fft // 2, c * hop_length + n_fft // 2)，
+    与 faster-whisper FeatureExtractor 的分帧方式一致；两端补齐方式不同：FeatureExtractor 按 reflect 补齐，
+    这里首列使用窗口之前的真实音频（流开头为 0），末尾不足一帧的列补零。
+    每次 feed() 只为新到达的音频计算 STFT，旧列在环中被自然覆盖；
+    features() 取出窗口时才做依赖整窗最大值的归一化。
+    """
+
+    def __init__(
+        self,
+        mel_filters: np.ndarray,
+        capacity_samples: int,
+        n_fft: int = 400,
+        hop_length: int = 160,
+    ) -> None:
+        self.mel_filters = np.asarray(mel_filters, dtype=np.float32)
+        self.n_fft = n_fft
+        self.hop_length = hop_length
+        self.half = n_fft // 2
+        self.fft_window = np.hanning(n_fft + 1)[:-1].astype(np.float32)
+        # 多留几列，保证窗口两端的列不会被新列覆盖
+        self.capacity = capacity_samples // hop_length + 4
+        # 未归一化的 log10 mel 能量，按列号取模存放
+        self.columns = np.zeros((self.mel_filters.shape[0], self.capacity), dtype=np.float32)
+        self.reset(0)
+
+    def reset(self, start_idx: int) -> None:
+        """
+        从 start_idx 重新开始累积；start_idx 之前的采样点视为 0（与流开头的补零一致）。
+        """
+        self.next_col = start_idx // self.hop_length
+        self.first_col = self.next_col
+        self.end_idx = start_idx
+        # tail 保存第 next_col 列起点之后、尚不足以构成完整帧的采样点
+        tail_samples = start_idx - (self.next_col * self.hop_length - self.half)
+        self.tail = np.zeros((tail_samples,), dtype=np.float32)
+
+    def _log_mel(self, frames: np.ndarray) -> np.ndarray:
+        spectrum = np.fft.rfft(frames * self.fft_window, n=self.n_fft, axis=-1)
+        magnitudes = (spectrum.real**2 + spectrum.imag**2).astype(np.float32)
+        mel_spec = self.mel_filters @ magnitudes.T
+        return np.log10(np.maximum(mel_spec, 1e-10))
+
+    def _frames(self, samples: np.ndarray, count: int) -> np.ndarray:
+        return np.lib.stride_tricks.as_strided(
+            samples,
+            (count, self.n_fft),
+            (self.hop_length * samples.strides[0], samples.strides[0]),
+            writeable=False,
+        )
+
+    def feed(self, chunk: np.ndarray) -> int:
+        """
+        追加紧接在 end_idx 之后的音频，只计算新变为完整的列，返回新增列数。
+        """
+        if len(chunk) == 0:
+            return 0
+        samples = np.concatenate([self.tail, chunk.astype(np.float32, copy=False)])
+        self.end_idx += len(chunk)
+        count = 0 if len(samples) < self.n_fft else (len(samples) - self.n_fft) // self.hop_length + 1
+        if count > 0:
+            log_spec = self._log_mel(self._frames(samples, count))
+            positions = np.arange(self.next_col, self.next_col + count) % self.capacity
+            self.columns[:, positions] = log_spec
+            self.next_col += count
+            self.first_col = max(self.first_col, self.next_col - self.capacity)
+        self.tail = samples[count * self.hop_length :].copy()
+        return count
+
+    def features(self, start_idx: int, end_idx: int) -> np.ndarray:
+        """
+        返回从 start_idx 所在列开始、到 end_idx 为止的归一化 log-mel，形状与
+        FeatureExtractor(audio[start_idx - start_idx % hop_length : end_idx]) 相同。
+        末尾不足一帧的列按补零临时计算，不写入缓存。
+        """
+        if end_idx != self.end_idx:
+            raise IndexError(f"features must end at the fed position {self.end_idx}, got {end_idx}")
+        first_col = start_idx // self.hop_length
+        last_col = (end_idx - first_col * self.hop_length) // self.hop_length + first_col
+        if first_col < self.first_col:
+            raise IndexError(f"column {first_col} is no longer cached (oldest is {self.first_col})")
+
+        output = np.empty((self.columns.shape[0], last_col - first_col + 1), dtype=np.float32)
+        cached = max(0, min(self.next_col, last_col + 1) - first_col)
+        if cached > 0:
+            positions = np.arange(first_col, first_col + cached) % self.capacity
+            np.take(self.columns, positions, axis=1, out=output[:, :cached])
+        edge = output.shape[1] - cached
+        if edge > 0:
+            # tail 从第 next_col 列的帧起点开始；窗口首列可能还在其后
+            offset = (max(first_col, self.next_col) - self.next_col) * self.hop_length
+            padded = np.concatenate([self.tail[offset:], np.zeros((self.n_fft,), dtype=np.float32)])
+            output[:, cached:] = self._log_mel(self._frames(padded, edge))
+
+        np.maximum(output, output.max() - 8.0, out=output)
+        output += 4.0
+        output /= 4.0
+        return output
@@ -0,0 +1,132 @@
+import numpy as np
+
+
+# int16 PCM 到 [-1, 1) float32 的缩放系数；用 float32 标量保证乘法在 float32 下完成
+PCM16_SCALE = np.float32(1 / 32768)
+
+
+class AudioRingBuffer:
+    """
+    固定容量的音频环形缓冲区。
+    对外使用绝对采样点索引 [start_idx, end_idx)，start_idx 之前的数据视为已释放，
+    其占用的空间会被后续写入复用，因此内存占用与会话时长无关。
+    """
+
+    # 缓冲区清空时是否把写入位置重新对齐到物理位置 0（跨进程共享时必须关闭）
+    reanchor = True
+
+    def __init__(self, capacity: int, dtype=np.float32, buffer: np.ndarray | None = None) -> None:
+        if capacity <= 0:
+            raise ValueError("capacity must be positive")
+        if buffer is not None and (len(buffer) != capacity or buffer.dtype != np.dtype(dtype)):
+            raise ValueError("buffer must be a 1-D array of `capacity` elements of `dtype`")
+        self.capacity = capacity
+        # buffer 可由外部提供（如共享内存），否则自行分配
+        self.data = np.zeros((capacity,), dtype=dtype) if buffer is None else buffer
+        # 窗口跨越环尾时的拼接区，首次跨越时分配一次并复用；只写不读的环（如网关侧共享环）不会分配
+        self.scratch: np.ndarray | None = None
+        self.copied_bytes = 0
+        self.reset()
+
+    def reset(self) -> None:
+        self.start_idx = 0
+        self.end_idx = 0
+        # 绝对索引 origin_idx 对应物理位置 0
+        self.origin_idx = 0
+
+    def __len__(self) -> int:
+        return self.end_idx - self.start_idx
+
+    def _pos(self, idx: int) -> int:
+        return (idx - self.origin_idx) % self.capacity
+
+    def release(self, idx: int) -> None:
+        """
+        释放 idx 之前的数据（只能向前推进，不会越过 end_idx）。
+        """
+        self.start_idx = min(max(idx, self.start_idx), self.end_idx)
+        if self.reanchor and self.start_idx == self.end_idx:
+            # 缓冲区清空时重新对齐到物理位置 0，让下一段窗口尽量不跨越环尾
+            self.origin_idx = self.end_idx
+
+    def write(self, chunk: np.ndarray) -> int:
+        """
+        追加写入 chunk，返回因容量不足而被丢弃的最早采样点数。
+        """
+        return self._write(chunk, None)
+
+    def write_pcm16(self, samples: np.ndarray) -> int:
+        """
+        追加写入 int16 PCM，缩放后直接存入缓冲区，不产生中间数组；返回值同 write()。
+        """
+        return self._write(samples, PCM16_SCALE)
+
+    def _store(self, pos: int, chunk: np.ndarray, scale: np.float32 | None) -> None:
+        if scale is None:
+            self.data[pos : pos + len(chunk)] = chunk
+        else:
+            np.multiply(chunk, scale, out=self.data[pos : pos + len(chunk)])
+
+    def _write(self, chunk: np.ndarray, scale: np.float32 | None) -> int:
+        n = len(chunk)
+        if n == 0:
+            return 0
+
+        new_end = self.end_idx + n
+        new_start = max(self.start_idx, new_end - self.capacity)
+        dropped = new_start - self.start_idx
+        if self.reanchor and new_start >= self.end_idx:
+            self.origin_idx = new_start
+        if n > self.capacity:
+            chunk = chunk[-self.capacity :]
+            n = self.capacity
+
+        pos = self._pos(new_end - n)
+        first = min(n, self.capacity - pos)
+        self._store(pos, chunk[:first], scale)
+        if first < n:
+            self._store(0, chunk[first:], scale)
+
+        self.start_idx = new_start
+        self.end_idx = new_end
+        return dropped
+
+    def _check_window(self, start_idx: int, end_idx: int) -> None:
+        if start_idx < self.start_idx or end_idx > self.end_idx or start_idx > end_idx:
+            raise IndexError(
+                f"window [{start_idx}, {end_idx}) is outside buffer "
+                f"[{self.start_idx}, {self.end_idx})"
+            )
+
+    def window(self, start_idx: int, end_idx: int) -> np.ndarray:
+        """
+        返回 [start_idx, end_idx) 区间的连续视图（调用方不应写入）。
+        未跨越环尾时零拷贝；跨越时拼接到复用的 scratch 中（下次调用前有效），
+        并把拷贝的字节数累加到 copied_bytes。
+        """
+        self._check_window(start_idx, end_idx)
+        n = end_idx - start_idx
+        pos = self._pos(start_idx)
+        if pos + n <= self.capacity:
+            view = self.data[pos : pos + n]
+        else:
+            first = self.capacity - pos
+            if self.scratch is None:
+                self.scratch = np.zeros((self.capacity,), dtype=self.data.dtype)
+            view = self.scratch[:n]
+            view[:first] = self.data[pos:]
+            view[first:] = self.data[: n - first]
+            self.copied_bytes += view.nbytes
+        return view
+
+    def read(self, start_idx: int, end_idx: int) -> np.ndarray:
+        """
+        复制并返回 [start_idx, end_idx) 区间的音频。
+        """
+        self._check_window(start_idx, end_idx)
+        n = end_idx - start_idx
+        pos = self._pos(start_idx)
+        if pos + n <= self.capacity:
+            return self.data[pos : pos + n].copy()
+        first = self.capacity - pos
+        return np.concatenate([self.data[pos:], self.data[: n - first]])
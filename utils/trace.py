@@ -0,0 +1,114 @@
+import json
+import os
+import threading
+import time
+from typing import Any
+
+
+class ChromeTracer:
+    """
+    把耗时区间写成 Chrome trace（JSON 数组格式）的事件，可直接在 Perfetto / chrome://tracing 中打开。
+    事件先编码成字符串放入最多 buffer_events 条的缓冲区，满了就追加写入文件，
+    因此内存占用与回放时长无关。每个 track（如会话 ID）显示为一条独立的线程轨道。
+    """
+
+    def __init__(self, path: str, *, buffer_events: int = 4096) -> None:
+        self.path = path
+        self.buffer_events = buffer_events
+        self.file = open(path, "w", encoding="utf-8")
+        self.file.write("[\n")
+        self.pid = os.getpid()
+        self.buffer: list[str] = []
+        self.tracks: dict[str, int] = {}
+        self.lock = threading.Lock()
+        self.first = True
+        self.event_count = 0
+
+    def now(self) -> int:
+        return time.perf_counter_ns()
+
+    def complete(
+        self,
+        name: str,
+        start_ns: int,
+        end_ns: int,
+        *,
+        track: str = "main",
+        category: str = "asr",
+        args: dict[str, Any] | None = None,
+    ) -> None:
+        """
+        记录一个完整区间（ph="X"），时间为 perf_counter_ns。
+        """
+        event = {
+            "name": name,
+            "cat": category,
+            "ph": "X",
+            "ts": start_ns / 1000,
+            "dur": (end_ns - start_ns) / 1000,
+            "pid": self.pid,
+            "tid": self._track_id(track),
+        }
+        if args:
+            event["args"] = args
+        self._append(json.dumps(event, ensure_ascii=False))
+
+    def _track_id(self, track: str) -> int:
+        tid = self.tracks.get(track)
+        if tid is None:
+            with self.lock:
+                tid = self.tracks.get(track)
+                if tid is None:
+                    tid = self.tracks[track] = len(self.tracks) + 1
+                    # 元数据事件让轨道以 track 名显示
+                    self._append_locked(
+                        json.dumps(
+                            {
+                                "name": "thread_name",
+                                "ph": "M",
+                                "pid": self.pid,
+                                "tid": tid,
+                                "args": {"name": track},
+                            },
+                            ensure_ascii=False,
+                        )
+                    )
+        return tid
+
+    def _append(self, line: str) -> None:
+        with self.lock:
+            self._append_locked(line)
+
+    def _append_locked(self, line: str) -> None:
+        self.buffer.append(line)
+        self.event_count += 1
+        if len(self.buffer) >= self.buffer_events:
+            self._flush_locked()
+
+    def _flush_locked(self) -> None:
+        if not self.buffer:
+            return
+        if not self.first:
+            self.file.write(",\n")
+        self.file.write(",\n".join(self.buffer))
+        self.first = False
+        self.buffer = []
+
+    def flush(self) -> None:
+        with self.lock:
+            self._flush_locked()
+            self.file.flush()
+
+    def close(self) -> None:
+        with self.lock:
+            if self.file.closed:
+                return
+            self._flush_locked()
+            self.file.write("\n]\n")
+            self.file.close()
+
+    def __enter__(self) -> "ChromeTracer":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
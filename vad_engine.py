@@ -0,0 +1,214 @@
+from abc import ABC, abstractmethod
+from collections import deque
+import importlib.util
+import os
+import threading
+from typing import Any, Iterable
+
+import numpy as np
+from faster_whisper import WhisperModel
+
+
+class VADBackend(ABC):
+    @abstractmethod
+    def detect(self, window: np.ndarray, window_start_idx: int) -> tuple[bool, list[float]]:
+        """
+        判断从 window_start_idx 开始的窗口是否含有语音，返回 (is_speech, no_speech_probs)。
+        """
+
+    def speech_frames(self, samples: np.ndarray, start_idx: int) -> list[tuple[int, bool]] | None:
+        """
+        逐帧判定从 start_idx 开始的新音频，返回 [(frame_end_idx, is_speech), ...]；
+        不提供帧级判定的后端返回 None，由调用方自行回退（如 ASREngine 的端点检测改用 RMS）。
+        """
+        return None
+
+    def reset(self) -> None:
+        pass
+
+
+class WhisperVAD(VADBackend):
+    def __init__(
+        self,
+        model: WhisperModel,
+        *,
+        no_speech_threshold: float = 0.8,
+        language: str = "ja",
+    ) -> None:
+        self.model = model
+        self.no_speech_threshold = no_speech_threshold
+        self.language = language
+
+    def detect(self, window: np.ndarray, window_start_idx: int) -> tuple[bool, list[float]]:
+        detect_segments, _ = self.model.transcribe(
+            window,
+            language=self.language,
+            without_timestamps=True,
+            condition_on_previous_text=False,
+        )
+        no_speech_probs = [segment.no_speech_prob for segment in detect_segments]
+        is_speech = len(no_speech_probs) > 0 and not all(
+            prob > self.no_speech_threshold for prob in no_speech_probs
+        )
+        return is_speech, no_speech_probs
+
+
+# model_path -> onnxruntime.InferenceSession，同一进程内的所有 SileroVAD 共享
+_silero_sessions: dict[str, Any] = {}
+_silero_sessions_lock = threading.Lock()
+
+
+def _silero_session(model_path: str) -> Any:
+    # InferenceSession.run 可并发调用，RNN 状态由调用方传入，因此一个进程只需加载一次模型
+    with _silero_sessions_lock:
+        session = _silero_sessions.get(model_path)
+        if session is None:
+            import onnxruntime
+
+            options = onnxruntime.SessionOptions()
+            options.inter_op_num_threads = 1
+            options.intra_op_num_threads = 1
+            session = onnxruntime.InferenceSession(
+                model_path, providers=["CPUExecutionProvider"], sess_options=options
+            )
+            _silero_sessions[model_path] = session
+        return session
+
+
+class SileroVAD(VADBackend):
+    """
+    基于 Silero VAD（ONNX）的流式 VAD。模型会话在进程内共享，每个实例只保存自己的
+    RNN 状态、上下文与各帧概率，因此每个会话只多占用几 KB。
+    """
+
+    def __init__(
+        self,
+        model_path: str | None = None,
+        *,
+        threshold: float = 0.5,
+        sample_rate: int = 16000,
+        history_sec: float = 30.0,
+    ) -> None:
+        if sample_rate != 16000:
+            raise ValueError("SileroVAD only supports 16000 Hz audio")
+        if model_path is None:
+            # 直接定位 silero_vad 包内的模型文件，不导入 silero_vad（它会引入 torch）
+            spec = importlib.util.find_spec("silero_vad")
+            if spec is None or not spec.submodule_search_locations:
+                raise ValueError("model_path is required when silero_vad is not installed")
+            model_path = os.path.join(
+                spec.submodule_search_locations[0], "data", "silero_vad.onnx"
+            )
+
+        self.session = _silero_session(model_path)
+        self.threshold = threshold
+        self.sample_rate = np.array(sample_rate, dtype=np.int64)
+        self.frame_samples = 512
+        self.context_samples = 64
+
+        self.input = np.zeros((1, self.context_samples + self.frame_samples), dtype=np.float32)
+        self.pending = np.zeros((self.frame_samples,), dtype=np.float32)
+        self.frame_probs: deque[tuple[int, float]] = deque(
+            maxlen=int(history_sec * sample_rate / self.frame_samples) + 1
+        )
+        self.reset()
+
+    def reset(self) -> None:
+        self.state = np.zeros((2, 1, 128), dtype=np.float32)
+        self.input[:] = 0.0
+        self.pending_samples = 0
+        self.next_idx = 0
+        self.frame_probs.clear()
+
+    def _run_frame(self, frame: np.ndarray) -> float:
+        self.input[0, self.context_samples :] = frame
+        prob, self.state = self.session.run(
+            None, {"input": self.input, "state": self.state, "sr": self.sample_rate}
+        )
+        self.input[0, : self.context_samples] = self.input[0, -self.context_samples :]
+        return float(prob[0][0])
+
+    def _accept(self, samples: np.ndarray, samples_start_idx: int) -> None:
+        pos = 0
+        if self.pending_samples > 0:
+            take = min(len(samples), self.frame_samples - self.pending_samples)
+            self.pending[self.pending_samples : self.pending_samples + take] = samples[:take]
+            self.pending_samples += take
+            pos = take
+            if self.pending_samples == self.frame_samples:
+                self.frame_probs.append(
+                    (samples_start_idx + pos, self._run_frame(self.pending))
+                )
+                self.pending_samples = 0
+
+        while len(samples) - pos >= self.frame_samples:
+            frame = samples[pos : pos + self.frame_samples]
+            pos += self.frame_samples
+            self.frame_probs.append((samples_start_idx + pos, self._run_frame(frame)))
+
+        rest = len(samples) - pos
+        if rest > 0:
+            self.pending[self.pending_samples : self.pending_samples + rest] = samples[pos:]
+            self.pending_samples += rest
+        self.next_idx = samples_start_idx + len(samples)
+
+    def speech_probs(self, audio: np.ndarray) -> np.ndarray:
+        """
+        返回 audio 中每个 512 采样点帧的语音概率（末尾不足一帧时补零）。
+        """
+        return self.speech_probs_blocks((audio,))
+
+    def speech_probs_blocks(self, blocks: Iterable[np.ndarray]) -> np.ndarray:
+        """
+        与 speech_probs() 相同，但逐块读入音频（块长任意），用于不把整个文件载入内存的场景。
+        """
+        self.reset()
+        probs: list[float] = []
+        frame = np.zeros((self.frame_samples,), dtype=np.float32)
+        fill = 0
+        for block in blocks:
+            pos = 0
+            while pos < len(block):
+                take = min(len(block) - pos, self.frame_samples - fill)
+                frame[fill : fill + take] = block[pos : pos + take]
+                fill += take
+                pos += take
+                if fill == self.frame_samples:
+                    probs.append(self._run_frame(frame))
+                    fill = 0
+        if fill > 0:
+            frame[fill:] = 0.0
+            probs.append(self._run_frame(frame))
+        self.reset()
+        return np.asarray(probs, dtype=np.float32)
+
+    def _advance(self, samples: np.ndarray, start_idx: int) -> None:
+        # detect() 与 speech_frames() 共用一条流式状态：已处理过的部分跳过，出现空洞时重新开始
+        if start_idx > self.next_idx:
+            self.reset()
+            self.next_idx = start_idx
+        offset = self.next_idx - start_idx
+        if offset < len(samples):
+            self._accept(samples[offset:], self.next_idx)
+
+    def speech_frames(self, samples: np.ndarray, start_idx: int) -> list[tuple[int, bool]]:
+        self._advance(samples, start_idx)
+        frames = []
+        for frame_end_idx, prob in reversed(self.frame_probs):
+            if frame_end_idx <= start_idx:
+                break
+            frames.append((frame_end_idx, prob >= self.threshold))
+        frames.reverse()
+        return frames
+
+    def detect(self, window: np.ndarray, window_start_idx: int) -> tuple[bool, list[float]]:
+        self._advance(window, window_start_idx)
+
+        max_prob = -1.0
+        for frame_end_idx, prob in reversed(self.frame_probs):
+            if frame_end_idx <= window_start_idx:
+                break
+            max_prob = max(max_prob, prob)
+        if max_prob < 0.0:
+            return False, []
+        return max_prob >= self.threshold, [1.0 - max_prob]